@@ -0,0 +1,178 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Request bị từ chối trước khi tốn CPU: hàng đợi đầy hoặc không kịp deadline."""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class ClientDisconnected(Exception):
+    """Client đã ngắt kết nối trong lúc request còn chờ / đang xử lý."""
+
+
+class AdmissionController:
+    """
+    Kiểm soát số request /predict được xử lý đồng thời, phía trước pool suy luận.
+
+    Tối đa `max_concurrency` chỗ được dùng cùng lúc (đủ để micro-batcher gom batch), mỗi
+    request chiếm `weight` chỗ (vd /predict/batch: số ảnh), tối đa `max_queue` request được
+    chờ theo thứ tự FIFO. Thời gian xử lý một request được
+    ước lượng bằng trung bình trượt (EWMA); request mới bị từ chối ngay khi hàng đợi đầy
+    hoặc khi thời gian chờ ước lượng + thời gian xử lý vượt deadline của nó, thay vì
+    nhận vào rồi hết giờ ở phía client. Request chờ quá deadline hoặc có client đã ngắt
+    kết nối được bỏ khỏi hàng đợi.
+    """
+
+    def __init__(self, max_concurrency, max_queue, initial_service_ms=200.0, alpha=0.2, poll_interval=0.1):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.alpha = alpha
+        self.poll_interval = poll_interval
+        self._service = initial_service_ms / 1000
+        self._running = 0
+        self._waiters = deque()
+
+        # Thống kê
+        self._counts = {
+            "admitted": 0, "rejected_queue_full": 0, "rejected_deadline": 0,
+            "expired_in_queue": 0, "disconnected": 0,
+        }
+        self._max_waiting = 0
+
+    # ------------------------------
+    # Ước lượng
+    # ------------------------------
+    def _clamp(self, weight):
+        # Request nặng hơn cả pool vẫn phải chạy được (chiếm toàn bộ chỗ)
+        return min(max(1, int(weight)), self.max_concurrency)
+
+    def estimated_wait(self, weight=1):
+        """Thời gian (giây) một request mới (chiếm `weight` chỗ) phải chờ trước khi được xử lý."""
+        weight = self._clamp(weight)
+        if self._running + weight <= self.max_concurrency and not self._waiters:
+            return 0.0
+        queued = sum(w for _, w in self._waiters) + weight - 1
+        return (queued // self.max_concurrency + 1) * self._service
+
+    def stats(self):
+        return {
+            **self._counts,
+            "running": self._running,
+            "waiting": len(self._waiters),
+            "max_waiting": self._max_waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "service_ms_ewma": round(self._service * 1000, 1),
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 1),
+        }
+
+    # ------------------------------
+    # Nhận / trả chỗ
+    # ------------------------------
+    @asynccontextmanager
+    async def admit(self, deadline, is_disconnected=None, weight=1):
+        """
+        Giữ `weight` chỗ xử lý trong khối `async with`.
+
+        `deadline` là mốc time.monotonic() mà client không còn chờ nữa,
+        `is_disconnected` là coroutine function (ví dụ `request.is_disconnected`).
+        Ném AdmissionRejected hoặc ClientDisconnected khi không được nhận.
+        Thời gian xử lý trung bình chỉ được cập nhật từ request weight=1.
+        """
+        weight = self._clamp(weight)
+        wait = self.estimated_wait(weight)
+        if wait > 0 and len(self._waiters) >= self.max_queue:
+            self._counts["rejected_queue_full"] += 1
+            raise AdmissionRejected("queue_full", wait)
+        if time.monotonic() + wait + self._service > deadline:
+            self._counts["rejected_deadline"] += 1
+            raise AdmissionRejected("deadline", wait)
+
+        if wait > 0:
+            await self._wait_for_slot(deadline, is_disconnected, weight)
+        else:
+            self._running += weight
+        self._counts["admitted"] += 1
+
+        started = time.monotonic()
+        completed = False
+        try:
+            yield
+            completed = True
+        finally:
+            if completed and weight == 1:
+                elapsed = time.monotonic() - started
+                self._service += self.alpha * (elapsed - self._service)
+            self._release(weight)
+
+    async def _wait_for_slot(self, deadline, is_disconnected, weight):
+        slot = asyncio.get_running_loop().create_future()
+        waiter = (slot, weight)
+        self._waiters.append(waiter)
+        self._max_waiting = max(self._max_waiting, len(self._waiters))
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counts["expired_in_queue"] += 1
+                    raise AdmissionRejected("expired", self.estimated_wait())
+                done, _ = await asyncio.wait({slot}, timeout=min(self.poll_interval, remaining))
+                if done:
+                    return
+                if is_disconnected is not None and await is_disconnected():
+                    self._counts["disconnected"] += 1
+                    raise ClientDisconnected()
+        except BaseException:
+            if slot.done() and not slot.cancelled():
+                self._release(weight)  # chỗ vừa được trao thì trả lại cho request kế tiếp
+            else:
+                slot.cancel()
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+                self._wake()  # request đứng đầu vừa rời đi có thể đang chặn các request sau
+            raise
+
+    def _release(self, weight=1):
+        self._running -= weight
+        self._wake()
+
+    def _wake(self):
+        # Trao chỗ theo đúng thứ tự FIFO: request đầu hàng chưa đủ chỗ thì các request sau cũng chờ
+        while self._waiters:
+            slot, weight = self._waiters[0]
+            if slot.done():
+                self._waiters.popleft()
+                continue
+            if self._running + weight > self.max_concurrency:
+                return
+            self._waiters.popleft()
+            self._running += weight
+            slot.set_result(None)
+
+
+async def unless_disconnected(aw, is_disconnected, poll_interval=0.1):
+    """
+    Chờ `aw`, nhưng huỷ nó ngay khi client ngắt kết nối (ảnh còn trong micro-batcher
+    sẽ bị bỏ khỏi batch vì future đã huỷ).
+    """
+    task = asyncio.ensure_future(aw)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
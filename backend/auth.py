@@ -1,8 +1,11 @@
 from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel, EmailStr
+from pymongo.errors import DuplicateKeyError
 from backend.mongodb_connection import get_database
 from datetime import datetime
 import hashlib
+import hmac
+from backend.config import ADMIN_API_KEY
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -20,10 +23,13 @@ class UserLogin(BaseModel):
     password: str
 
 # ------------------------------
-# Kết nối MongoDB
+# Kết nối MongoDB (lười: chỉ kết nối ở request đầu tiên, có thử lại)
 # ------------------------------
-db = get_database()
-users_collection = db["users"]
+def get_users_collection():
+    try:
+        return get_database()["users"]
+    except Exception:
+        raise HTTPException(status_code=503, detail="Không kết nối được cơ sở dữ liệu, vui lòng thử lại sau.")
 
 # ------------------------------
 # Hàm tiện ích
@@ -31,11 +37,26 @@ users_collection = db["users"]
 def hash_password(pw: str):
     return hashlib.sha256(pw.encode()).hexdigest()
 
+def duplicate_field(e: DuplicateKeyError):
+    """Trường bị trùng (username / email) theo unique index, khi hai request ghi cùng lúc vượt qua bước kiểm tra."""
+    pattern = (e.details or {}).get("keyPattern") or {}
+    if pattern:
+        return next(iter(pattern))
+    return "email" if "email_unique" in str(e) else "username"
+
+def check_admin_key(key):
+    """Kiểm tra header X-Admin-Key cho các endpoint quản trị (/admin/*)."""
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=404, detail="Chức năng quản trị chưa được bật (ADMIN_API_KEY).")
+    if not key or not hmac.compare_digest(key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Sai hoặc thiếu X-Admin-Key.")
+
 # ------------------------------
 # API Đăng ký
 # ------------------------------
 @router.post("/register")
 def register(user: UserRegister):
+    users_collection = get_users_collection()
     # Kiểm tra trùng username hoặc email
     if users_collection.find_one({"username": user.username}):
         raise HTTPException(status_code=400, detail="Tên người dùng đã tồn tại.")
@@ -49,11 +70,16 @@ def register(user: UserRegister):
         "username": user.username,
         "email": user.email,
         "password": hashed_pw,
-        "created_at": datetime.now(),
+        "created_at": datetime.utcnow(),
         "last_login": None
     }
 
-    result = users_collection.insert_one(new_user)
+    try:
+        result = users_collection.insert_one(new_user)
+    except DuplicateKeyError as e:
+        if duplicate_field(e) == "email":
+            raise HTTPException(status_code=400, detail="Email này đã được sử dụng.")
+        raise HTTPException(status_code=400, detail="Tên người dùng đã tồn tại.")
     if not result.inserted_id:
         raise HTTPException(status_code=500, detail="Không thể lưu người dùng vào cơ sở dữ liệu.")
 
@@ -62,6 +88,7 @@ def register(user: UserRegister):
 
 @router.post("/login")
 def login(user: UserLogin):
+    users_collection = get_users_collection()
     db_user = users_collection.find_one({"username": user.username})
     if not db_user:
         raise HTTPException(status_code=404, detail="Vui lòng nhập đầy đủ thông tin.")
@@ -86,6 +113,7 @@ def login(user: UserLogin):
 # ------------------------------
 @router.get("/info")
 def get_user_info(username: str):
+    users_collection = get_users_collection()
     user = users_collection.find_one({"username": username}, {"_id": 0, "password": 0})
     if not user:
         raise HTTPException(status_code=404, detail="Không tìm thấy người dùng.")
@@ -108,6 +136,7 @@ def update_user_info(
     password: str = Body(None),
     confirm_password: str = Body(None)
 ):
+    users_collection = get_users_collection()
     user = users_collection.find_one({"username": username})
     if not user:
         raise HTTPException(status_code=404, detail="Không tìm thấy người dùng.")
@@ -138,7 +167,12 @@ def update_user_info(
         raise HTTPException(status_code=400, detail="Không có thông tin nào để cập nhật.")
 
     update_data["updated_at"] = datetime.utcnow()
-    result = users_collection.update_one({"username": username}, {"$set": update_data})
+    try:
+        result = users_collection.update_one({"username": username}, {"$set": update_data})
+    except DuplicateKeyError as e:
+        if duplicate_field(e) == "email":
+            raise HTTPException(status_code=400, detail="Email này đã được sử dụng bởi tài khoản khác.")
+        raise HTTPException(status_code=400, detail="Tên người dùng này đã tồn tại.")
 
     if result.modified_count == 0:
         raise HTTPException(status_code=500, detail="Không thể cập nhật thông tin người dùng.")
@@ -0,0 +1,130 @@
+import asyncio
+import time
+from collections import Counter
+
+
+class _Item:
+    __slots__ = ("image", "conf", "future", "enqueued_at")
+
+    def __init__(self, image, conf, future):
+        self.image = image
+        self.conf = conf
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class MicroBatcher:
+    """
+    Gom các ảnh đến đồng thời thành một batch trước khi đưa vào model.
+
+    Batch được đẩy đi khi đủ `max_batch_size` ảnh, hoặc khi ảnh đầu tiên
+    trong hàng đợi đã chờ quá `max_wait_ms`. `predict_fn(images, confs)`
+    là hàm đồng bộ, nhận danh sách ảnh + ngưỡng conf tương ứng và trả về
+    danh sách kết quả cùng thứ tự. `run(fn, *args)` là coroutine dùng để
+    chạy `predict_fn` ngoài event loop (mặc định `asyncio.to_thread`).
+    `max_concurrency` là số batch được chạy đồng thời (ví dụ bằng số worker
+    khi dùng pool nhiều tiến trình).
+    """
+
+    def __init__(self, predict_fn, max_batch_size=8, max_wait_ms=5.0, run=None, max_concurrency=1):
+        self._predict_fn = predict_fn
+        self._run_fn = run or asyncio.to_thread
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._queue = None
+        self._slots = None
+        self._worker = None
+        self._flushing = set()
+
+        # Thống kê
+        self._batches = 0
+        self._images = 0
+        self._sizes = Counter()
+        self._wait_total = 0.0
+        self._max_depth = 0
+
+    # ------------------------------
+    # API công khai
+    # ------------------------------
+    async def submit(self, image, conf):
+        """Xếp ảnh vào hàng đợi và chờ kết quả của riêng ảnh đó."""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_Item(image, conf, future))
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+        return await future
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue_depth": self._max_depth,
+            "batches": self._batches,
+            "images": self._images,
+            "avg_batch_size": round(self._images / self._batches, 2) if self._batches else 0.0,
+            "avg_queue_wait_ms": round(self._wait_total / self._images * 1000, 2) if self._images else 0.0,
+            "batch_size_histogram": {str(k): v for k, v in sorted(self._sizes.items())},
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches_in_flight": len(self._flushing),
+        }
+
+    # ------------------------------
+    # Vòng lặp gom batch
+    # ------------------------------
+    def _ensure_started(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Chờ có chỗ trống trước, ảnh đến trong lúc đó sẽ dồn thành batch lớn hơn
+            await self._slots.acquire()
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                try:
+                    if timeout <= 0:
+                        batch.append(self._queue.get_nowait())
+                    else:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+            task = asyncio.create_task(self._flush(batch))
+            self._flushing.add(task)
+            task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task):
+        self._flushing.discard(task)
+        self._slots.release()
+
+    async def _flush(self, batch):
+        # Bỏ qua request mà client đã huỷ trong lúc chờ
+        batch = [it for it in batch if not it.future.done()]
+        if not batch:
+            return
+
+        now = time.perf_counter()
+        self._batches += 1
+        self._images += len(batch)
+        self._sizes[len(batch)] += 1
+        self._wait_total += sum(now - it.enqueued_at for it in batch)
+
+        try:
+            results = await self._run_fn(
+                self._predict_fn, [it.image for it in batch], [it.conf for it in batch]
+            )
+        except Exception as e:
+            for it in batch:
+                if not it.future.done():
+                    it.future.set_exception(e)
+            return
+
+        for it, result in zip(batch, results):
+            if not it.future.done():
+                it.future.set_result(result)
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResultCache:
+    """
+    Cache kết quả suy luận, khoá theo nội dung ảnh (hash bytes) + các tham số ảnh hưởng kết quả.
+
+    Tầng bộ nhớ: LRU giới hạn `max_entries` phần tử, mỗi phần tử sống `ttl` giây.
+    Tầng đĩa (tuỳ chọn, `disk_dir`): mỗi kết quả một file pickle, dùng khi tầng bộ nhớ trượt
+    và được đẩy ngược lên bộ nhớ khi trúng.
+    """
+
+    def __init__(self, max_entries=256, ttl=3600, disk_dir=None):
+        self.max_entries = max(0, int(max_entries))
+        self.ttl = float(ttl)
+        self.disk_dir = disk_dir or None
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+        self._mem = OrderedDict()  # key -> (hết hạn lúc, giá trị)
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0 or bool(self.disk_dir)
+
+    @staticmethod
+    def make_key(data, *parts):
+        h = hashlib.blake2b(data, digest_size=20)
+        for p in parts:
+            h.update(b"\0" + str(p).encode())
+        return h.hexdigest()
+
+    # ------------------------------
+    # Đọc / ghi
+    # ------------------------------
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._mem.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._mem.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._mem[key]
+                self._expirations += 1
+
+        value = self._disk_get(key)
+        with self._lock:
+            if value is None:
+                self._misses += 1
+                return None
+            self._disk_hits += 1
+            self._mem_put(key, value, now)
+        return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._mem_put(key, value, time.monotonic())
+        self._disk_put(key, value)
+
+    def _mem_put(self, key, value, now):
+        if self.max_entries <= 0:
+            return
+        self._mem[key] = (now + self.ttl, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self._evictions += 1
+
+    # ------------------------------
+    # Tầng đĩa
+    # ------------------------------
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[:2], key + ".pkl")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                with self._lock:
+                    self._expirations += 1
+                return None
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+    def _disk_put(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError as e:
+            print("⚠️ Không ghi được cache ra đĩa:", e)
+
+    def stats(self):
+        lookups = self._hits + self._disk_hits + self._misses
+        return {
+            "entries": len(self._mem),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "disk_dir": self.disk_dir,
+            "hits": self._hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "expirations": self._expirations,
+            "hit_ratio": round((self._hits + self._disk_hits) / lookups, 3) if lookups else 0.0,
+        }
@@ -1,4 +1,6 @@
 import os
+from datetime import datetime
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -8,8 +10,96 @@ ROOT_DIR = os.path.dirname(BASE_DIR)
 
 MODEL_PATH = os.path.join(ROOT_DIR, "yolov8", "best.pt")
 
+# Registry nhiều model: "tên=đường_dẫn.pt,..." (đường dẫn tương đối tính từ thư mục gốc),
+# ví dụ "v8n=yolov8/best_n.pt,v8s=yolov8/best_s.pt". Để trống = một model "default" = MODEL_PATH
+MODEL_REGISTRY = os.getenv("MODEL_REGISTRY", "")
+DEFAULT_MODEL = os.getenv("DEFAULT_MODEL", "")  # để trống = model đầu tiên trong registry
+# Chia request A/B khi client không chọn ?model=: "v8n=80,v8s=20". Để trống = mọi request vào DEFAULT_MODEL
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "")
+
+# Runtime suy luận: torch (mặc định) | onnx (ONNX Runtime) | openvino | onnx-int8
+# Artifact được export một lần và lưu cạnh best.pt
+INFERENCE_RUNTIME = os.getenv("INFERENCE_RUNTIME", "torch").lower()
+MODEL_IMGSZ = int(os.getenv("MODEL_IMGSZ", "640"))
+# Thư mục ảnh dùng để hiệu chỉnh khi lượng tử hoá INT8
+QUANT_CALIB_DIR = os.getenv("QUANT_CALIB_DIR", os.path.join(ROOT_DIR, "example"))
+
 API_TITLE = "YOLOv8 Mit Detection API"
 API_DESCRIPTION = "API nhận dạng & phân loại độ chín trái mít 🌾"
 API_VERSION = "1.0.0"
+
+# ------------------------------
+# Suy luận theo lô (batch)
+# ------------------------------
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "64"))
+
+# Micro-batching cho /predict: gom tối đa N ảnh hoặc chờ tối đa vài ms
+MICROBATCH_MAX_SIZE = int(os.getenv("MICROBATCH_MAX_SIZE", "8"))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv("MICROBATCH_MAX_WAIT_MS", "5"))
+
+# Thread pool cho các bước nặng CPU (giải mã, YOLO, vẽ, mã hoá)
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", str(min(4, os.cpu_count() or 1))))
+INFERENCE_QUEUE_LIMIT = int(os.getenv("INFERENCE_QUEUE_LIMIT", "32"))
+
+# Pool nhiều tiến trình: 0 = chạy YOLO ngay trong tiến trình API
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+WORKER_CORES = int(os.getenv("WORKER_CORES", "0"))  # số core mỗi worker, 0 = chia đều
+
+# Kiểm soát nhận request /predict: số request xử lý đồng thời (mặc định đủ gom một batch mỗi worker),
+# số request được chờ, deadline mặc định (thấp hơn timeout 30 s của frontend để từ chối sớm).
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", str(MICROBATCH_MAX_SIZE * max(1, INFERENCE_WORKERS))))
+ADMISSION_QUEUE_LIMIT = int(os.getenv("ADMISSION_QUEUE_LIMIT", "64"))
+ADMISSION_DEADLINE_MS = int(os.getenv("ADMISSION_DEADLINE_MS", "25000"))
+ADMISSION_MAX_DEADLINE_MS = int(os.getenv("ADMISSION_MAX_DEADLINE_MS", "60000"))
+
+# Giải mã JPEG ở độ phân giải giảm khi ảnh lớn hơn nhiều so với đầu vào model (0 = luôn giải mã đầy đủ)
+DECODE_TARGET_SIZE = int(os.getenv("DECODE_TARGET_SIZE", "640"))
+
+# Chế độ chia ô (?tile=true) cho ảnh chụp cả cây độ phân giải cao
+TILE_SIZE = int(os.getenv("TILE_SIZE", "640"))
+TILE_OVERLAP = float(os.getenv("TILE_OVERLAP", "0.2"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+TILE_MAX_COUNT = int(os.getenv("TILE_MAX_COUNT", "64"))  # số ô tối đa mỗi ảnh (cả batch đưa vào model một lượt)
+
+# /predict/video: nhận dạng 1 trong mỗi N khung, tối đa M khung suy luận cùng lúc
+VIDEO_FRAME_STRIDE = int(os.getenv("VIDEO_FRAME_STRIDE", "5"))
+VIDEO_INFLIGHT_FRAMES = int(os.getenv("VIDEO_INFLIGHT_FRAMES", "4"))
+
+# WebSocket /predict/ws: giới hạn độ phân giải (cạnh dài) và chất lượng JPEG client được chọn
+WS_DEFAULT_WIDTH = int(os.getenv("WS_DEFAULT_WIDTH", "640"))
+WS_MAX_WIDTH = int(os.getenv("WS_MAX_WIDTH", "1280"))
+WS_DEFAULT_QUALITY = int(os.getenv("WS_DEFAULT_QUALITY", "70"))
+
+# Mã hoá ảnh annotate trả về (client ghi đè theo request: max_dim, quality, progressive, image_format, thumbnail)
+IMAGE_MAX_DIM = int(os.getenv("IMAGE_MAX_DIM", "0"))  # 0 = giữ độ phân giải ảnh đã giải mã
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "75"))
+THUMBNAIL_MAX_DIM = int(os.getenv("THUMBNAIL_MAX_DIM", "512"))  # giới hạn cạnh dài thumbnail client được xin
+
+# ------------------------------
+# Cache kết quả /predict (khoá theo hash ảnh + model + tham số)
+# ------------------------------
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))  # 0 = tắt tầng bộ nhớ
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "")  # để trống = không dùng tầng đĩa
+
+# ------------------------------
+# Quản trị & profiling theo yêu cầu
+# ------------------------------
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")  # để trống = tắt các endpoint /admin và ?profile=1
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))  # tỉ lệ request được lấy mẫu, 0 = tắt
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR") or os.path.join(ROOT_DIR, "profiles")  # để trống = mặc định
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "200"))
+
+# ------------------------------
+# MongoDB: index + schema (python -m backend.migrations)
+# ------------------------------
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "1") == "1"  # chạy migration còn thiếu ở luồng nền khi khởi động
+
+# /stats: thống kê vườn tính bằng aggregation phía MongoDB
+STATS_DEFAULT_DAYS = int(os.getenv("STATS_DEFAULT_DAYS", "30"))  # khoảng thời gian khi client không gửi start
+STATS_MAX_BUCKETS = int(os.getenv("STATS_MAX_BUCKETS", "1000"))  # chặn khoảng quá dài với bucket quá nhỏ (vd hour × nhiều năm)
+# Múi giờ dùng để chia bucket giờ/ngày/tuần (tên IANA hoặc dạng +07:00); mặc định múi giờ của máy chủ
+STATS_TIMEZONE = os.getenv("STATS_TIMEZONE") or datetime.now().astimezone().strftime("%z")
 #code:start
 
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PoolSaturatedError(RuntimeError):
+    """Pool suy luận đã đầy (đang chạy + đang chờ vượt giới hạn)."""
+
+
+class InferencePool:
+    """
+    Thread pool có giới hạn dành cho các bước nặng CPU (giải mã, YOLO, vẽ, mã hoá JPEG),
+    để event loop của uvicorn luôn rảnh cho /auth và các request nhẹ khác.
+
+    Tối đa `max_workers` việc chạy cùng lúc và `max_pending` việc xếp hàng;
+    vượt quá thì `run()` ném `PoolSaturatedError` ngay thay vì để request chờ vô hạn.
+    """
+
+    def __init__(self, max_workers, max_pending):
+        self.max_workers = max(1, int(max_workers))
+        self.max_pending = max(0, int(max_pending))
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        self._lock = threading.Lock()
+        self._inflight = 0
+        self._rejected = 0
+
+    async def run(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._inflight >= self.max_workers + self.max_pending:
+                self._rejected += 1
+                raise PoolSaturatedError("Pool suy luận đã đầy.")
+            self._inflight += 1
+
+        try:
+            future = self._executor.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # Giải phóng chỗ khi việc thực sự xong (kể cả khi request phía trên đã bị huỷ)
+        future.add_done_callback(lambda _: self._release())
+        return await asyncio.wrap_future(future)
+
+    def _release(self):
+        with self._lock:
+            self._inflight -= 1
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "inflight": self._inflight,
+            "rejected": self._rejected,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
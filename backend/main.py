@@ -1,18 +1,58 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+import threading
+import time
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from .config import API_TITLE, API_DESCRIPTION, API_VERSION
-from .predictor import router as predict_router   
-from .auth import router as auth_router   
+from fastapi.responses import JSONResponse, Response
+from starlette.routing import Match
+from .config import API_TITLE, API_DESCRIPTION, API_VERSION, MIGRATE_ON_STARTUP
+from . import metrics
+from . import migrations
+from . import predictor
+from .profiling import profile_requests, router as profiling_router
+from .predictor import router as predict_router, admin_router as models_admin_router
+from .auth import router as auth_router
+from .stats import router as stats_router
+from .mongodb_connection import connect, is_connected
+
+
+MONGO_RECONNECT_INTERVAL_S = 10
+
+
+def _connect_mongo():
+    # Thử lại cho tới khi kết nối được; trong lúc đó /auth, /stats trả 503 ngay
+    while True:
+        try:
+            connect()
+            break
+        except Exception:
+            time.sleep(MONGO_RECONNECT_INTERVAL_S)
+    if MIGRATE_ON_STARTUP:
+        try:
+            migrations.migrate()
+        except Exception as e:
+            print("❌ Lỗi migration MongoDB:", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Không chặn khởi động: model và MongoDB được chuẩn bị ở luồng nền
+    predictor.start_loading()
+    threading.Thread(target=_connect_mongo, name="mongo-connect", daemon=True).start()
+    yield
+    predictor.shutdown()
 
 
 app = FastAPI(
     title=API_TITLE,
-    description=API_DESCRIPTION,  
-    version=API_VERSION,  
+    description=API_DESCRIPTION,
+    version=API_VERSION,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
-    CORSMiddleware,  
+    CORSMiddleware,
     allow_origins=["*"],
     allow_methods=["*"],
     allow_headers=["*"],
@@ -20,7 +60,60 @@ app.add_middleware(
 
 app.include_router(predict_router)
 app.include_router(auth_router)
+app.include_router(stats_router)
+app.include_router(profiling_router)
+app.include_router(models_admin_router)
+app.middleware("http")(profile_requests)
+
+
+def _route_label(scope):
+    """Nhãn route theo mẫu đường dẫn (không theo URL thật) để metrics không phình nhãn."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return "other"
+
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+    route = _route_label(request.scope)
+    inflight = metrics.HTTP_INFLIGHT.labels(route=route)
+    inflight.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        inflight.dec()
+        metrics.HTTP_REQUESTS.inc(route=route, method=request.method, status=status)
+        metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route=route, method=request.method)
 
 @app.get("/")
 def root():
-    return {"message": "🚀 YOLOv8 Mit Detection API hoạt động!"}     
+    return {"message": "🚀 YOLOv8 Mit Detection API hoạt động!"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Metrics dạng Prometheus text cho Prometheus / Grafana scrape."""
+    return Response(metrics.render_all(), media_type=metrics.CONTENT_TYPE)
+
+
+# ------------------------------
+# Health check
+# ------------------------------
+@app.get("/health/live")
+async def liveness():
+    """Tiến trình còn sống và event loop còn phản hồi (async: không phụ thuộc threadpool)."""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Sẵn sàng phục vụ /predict nhanh: model đã nạp + warm-up xong."""
+    body = {**predictor.readiness(), "mongo_connected": is_connected()}
+    body["status"] = "ready" if body["model_ready"] else "starting"
+    return JSONResponse(body, status_code=200 if body["model_ready"] else 503)
@@ -0,0 +1,210 @@
+"""
+Metrics dạng Prometheus (text exposition format 0.0.4), viết gọn không cần thư viện ngoài.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        _registry.append(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+        return child
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines += self._samples()
+        return "\n".join(lines)
+
+
+class _Value:
+    __slots__ = ("value", "_lock", "fn")
+
+    def __init__(self):
+        self.value = 0.0
+        self.fn = None
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+    def set(self, value):
+        self.value = float(value)
+
+    def set_function(self, fn):
+        """Giá trị được đọc lúc scrape (ví dụ độ sâu hàng đợi)."""
+        self.fn = fn
+
+    def get(self):
+        return float(self.fn()) if self.fn else self.value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0, **labels):
+        self.labels(**labels).inc(amount)
+
+    def total(self):
+        """Tổng giá trị của mọi nhãn."""
+        with self._lock:
+            children = list(self._children.values())
+        return sum(v.get() for v in children)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._children.items())
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {v.get()}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    self.counts[i] += 1
+                    break
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help_text, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value, **labels):
+        self.labels(**labels).observe(value)
+
+    def _samples(self):
+        out = []
+        with self._lock:
+            items = list(self._children.items())
+        for key, child in items:
+            with child._lock:
+                counts, total, n = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for b, c in zip(self.buckets, counts):
+                cumulative += c
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [('le', b)])} {cumulative}")
+            out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, key, [('le', '+Inf')])} {n}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labelnames, key)} {total}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labelnames, key)} {n}")
+        return out
+
+
+def render_all():
+    return "\n".join(m.render() for m in _registry) + "\n"
+
+
+# ------------------------------
+# Metrics của hệ thống
+# ------------------------------
+HTTP_REQUESTS = Counter("mit_http_requests_total", "Số request HTTP theo route, method, status", ("route", "method", "status"))
+HTTP_INFLIGHT = Gauge("mit_http_requests_in_flight", "Số request HTTP đang xử lý theo route", ("route",))
+HTTP_LATENCY = Histogram("mit_http_request_duration_seconds", "Thời gian xử lý request HTTP", ("route", "method"))
+
+STAGE_SECONDS = Histogram(
+    "mit_predict_stage_seconds",
+    "Thời gian từng bước của pipeline nhận dạng (read, cache, queue, decode, inference, postprocess, render, encode)",
+    ("stage", "model"),
+)
+BATCH_SIZE = Histogram(
+    "mit_inference_batch_size", "Số ảnh mỗi lần gọi model", ("model",),
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+FORWARD_SECONDS = Histogram("mit_model_forward_seconds", "Thời gian một lần forward (cả batch) theo model", ("model",))
+DETECTIONS = Counter("mit_detections_total", "Số box nhận dạng được theo model và lớp", ("model", "label"))
+CACHE_EVENTS = Counter("mit_result_cache_total", "Tra cứu cache kết quả /predict", ("result",))
+QUEUE_DEPTH = Gauge("mit_batcher_queue_depth", "Số ảnh đang chờ trong micro-batcher")
+POOL_INFLIGHT = Gauge("mit_inference_pool_inflight", "Số việc đang chạy + chờ trong pool suy luận")
+ADMISSION_EVENTS = Counter(
+    "mit_admission_total", "Kết quả kiểm soát nhận request /predict (admitted, queue_full, deadline, expired, disconnected)",
+    ("result",),
+)
+ADMISSION_WAITING = Gauge("mit_admission_waiting", "Số request /predict đang chờ được xử lý")
+
+
+class StageTimer:
+    """Đo thời gian từng bước của một request; xuất ra histogram và header Server-Timing."""
+
+    def __init__(self):
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - t0)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def observe(self, model):
+        for name, seconds in self.stages.items():
+            STAGE_SECONDS.observe(seconds, stage=name, model=model)
+
+    def server_timing(self):
+        parts = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self._start) * 1000:.1f}")
+        return ", ".join(parts)
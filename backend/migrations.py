@@ -0,0 +1,276 @@
+"""
+Index + phiên bản schema cho các collection MongoDB.
+
+Chạy từ thư mục gốc:
+    python -m backend.migrations             # áp dụng các migration còn thiếu
+    python -m backend.migrations --status    # xem phiên bản schema hiện tại
+    python -m backend.migrations --explain   # kiểm tra truy vấn nóng không quét toàn collection
+
+Mỗi migration có số phiên bản tăng dần và chạy lại nhiều lần vẫn cho cùng kết quả
+(create_index đã có thì bỏ qua). Phiên bản đã áp dụng được ghi ở nam_db.schema_migrations.
+Backend cũng tự chạy các migration còn thiếu ở luồng nền khi khởi động (MIGRATE_ON_STARTUP).
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+from .mongodb_connection import connect, get_database, get_logs_database
+from .rollups import ROLLUP_COLLECTION, ROLLUP_KEY, rebuild as rebuild_rollups
+
+SCHEMA_COLLECTION = "schema_migrations"
+LOG_COLLECTIONS = ("analysis_logs", "video_logs", "chat_logs", "compare_logs")
+
+TIMESTAMP_BATCH_SIZE = 500
+# Sai số cho phép giữa users.created_at và thời điểm tạo ghi trong ObjectId (_id)
+CREATED_AT_TOLERANCE_S = 60
+
+_DUPLICATE_KEY = 11000
+
+
+# ------------------------------
+# Các migration
+# ------------------------------
+def _unique_index(col, field):
+    try:
+        col.create_index([(field, ASCENDING)], unique=True, name=f"{field}_unique")
+    except OperationFailure as e:
+        if e.code != _DUPLICATE_KEY:
+            raise
+        dups = list(col.aggregate([
+            {"$group": {"_id": f"${field}", "n": {"$sum": 1}}},
+            {"$match": {"n": {"$gt": 1}}},
+            {"$limit": 5},
+        ]))
+        sample = ", ".join(f"{d['_id']!r} ×{d['n']}" for d in dups)
+        raise RuntimeError(
+            f"Không tạo được unique index {col.name}.{field}: còn giá trị trùng ({sample}). "
+            f"Hãy gộp/xoá bản ghi trùng rồi chạy lại."
+        ) from e
+
+
+def _v1_indexes(users_db, logs_db):
+    users = users_db["users"]
+    _unique_index(users, "username")
+    _unique_index(users, "email")
+    for name in LOG_COLLECTIONS:
+        logs_db[name].create_index(
+            [("username", ASCENDING), ("timestamp", DESCENDING)], name="username_timestamp",
+        )
+
+
+def parse_legacy_timestamp(value):
+    """
+    Chuỗi ISO cũ (`datetime.now().isoformat()`, giờ địa phương của máy ghi log) → datetime UTC.
+    Trả về None nếu không đọc được.
+    """
+    try:
+        dt = datetime.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        return None
+    # Chuỗi không có múi giờ: astimezone() coi là giờ địa phương của máy chạy migration
+    return dt.astimezone(timezone.utc)
+
+
+def convert_string_timestamps(users_db, logs_db, batch_size=TIMESTAMP_BATCH_SIZE):
+    """
+    Đổi `timestamp` dạng chuỗi sang BSON date theo từng lô, duyệt theo _id.
+    _id cuối cùng của mỗi lô được lưu ở schema_migrations nên chạy lại sau khi bị ngắt
+    sẽ tiếp tục từ chỗ dừng; bản ghi đã đổi không còn khớp bộ lọc nên không bị xử lý lại.
+    """
+    progress = users_db[SCHEMA_COLLECTION]
+    for name in LOG_COLLECTIONS:
+        col = logs_db[name]
+        checkpoint_id = f"timestamps:{name}"
+        checkpoint = progress.find_one({"_id": checkpoint_id}) or {}
+        last_id = checkpoint.get("last_id")
+        converted = checkpoint.get("converted", 0)
+        skipped = checkpoint.get("skipped", 0)
+        while True:
+            query = {"timestamp": {"$type": "string"}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            batch = list(col.find(query, {"timestamp": 1}).sort("_id", ASCENDING).limit(batch_size))
+            if not batch:
+                break
+            ops = []
+            for doc in batch:
+                ts = parse_legacy_timestamp(doc["timestamp"])
+                if ts is None:
+                    skipped += 1
+                    continue
+                # Điều kiện $type: không ghi đè nếu bản ghi vừa được sửa ở nơi khác
+                ops.append(UpdateOne({"_id": doc["_id"], "timestamp": {"$type": "string"}}, {"$set": {"timestamp": ts}}))
+            if ops:
+                converted += col.bulk_write(ops, ordered=False).modified_count
+            last_id = batch[-1]["_id"]
+            progress.update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"last_id": last_id, "converted": converted, "skipped": skipped, "updated_at": datetime.utcnow()}},
+                upsert=True,
+            )
+        print(f"   {name}: đã đổi {converted} bản ghi" + (f", bỏ qua {skipped} chuỗi không đọc được" if skipped else ""))
+
+
+def _v3_daily_rollups(users_db, logs_db):
+    logs_db[ROLLUP_COLLECTION].create_index(
+        [(field, ASCENDING) for field in ROLLUP_KEY], unique=True, name="username_day_source",
+    )
+    rebuild_rollups(logs_db)
+
+
+def rebase_users_created_at(users_db, logs_db, batch_size=TIMESTAMP_BATCH_SIZE):
+    """
+    `users.created_at` cũ được ghi bằng `datetime.now()` (giờ địa phương, không múi giờ) nên đọc
+    ra như UTC thì lệch đúng offset múi giờ; bản ghi mới dùng `datetime.utcnow()`.
+    Bản ghi cũ được nhận ra nhờ thời điểm tạo (UTC) nằm trong ObjectId: nếu coi created_at là giờ
+    địa phương của máy chạy migration mà khớp _id thì đổi sang UTC. Bản ghi đã đúng UTC không khớp
+    điều kiện đó nên chạy lại không đổi gì thêm.
+    """
+    users = users_db["users"]
+    ops = []
+    rebased = 0
+    for doc in users.find({"created_at": {"$type": "date"}}, {"created_at": 1}):
+        if not isinstance(doc["_id"], ObjectId):
+            continue
+        stored = doc["created_at"].replace(tzinfo=None)  # client backend trả datetime UTC không múi giờ
+        as_local = stored.astimezone(timezone.utc).replace(tzinfo=None)
+        created = doc["_id"].generation_time.replace(tzinfo=None)
+        if as_local == stored or abs((as_local - created).total_seconds()) > CREATED_AT_TOLERANCE_S:
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"], "created_at": doc["created_at"]}, {"$set": {"created_at": as_local}}))
+        if len(ops) >= batch_size:
+            rebased += users.bulk_write(ops, ordered=False).modified_count
+            ops = []
+    if ops:
+        rebased += users.bulk_write(ops, ordered=False).modified_count
+    print(f"   users: đã đổi created_at của {rebased} tài khoản sang UTC")
+
+
+MIGRATIONS = [
+    (1, "unique index users.username, users.email; index (username, timestamp) cho các collection log", _v1_indexes),
+    (2, "timestamp dạng chuỗi ISO → BSON date (theo lô, chạy tiếp được khi bị ngắt)", convert_string_timestamps),
+    (3, "collection daily_rollups: unique index (username, day, source) + tính từ log hiện có", _v3_daily_rollups),
+    (4, "users.created_at giờ địa phương (bản ghi cũ) → UTC, nhận diện theo thời điểm tạo trong _id", rebase_users_created_at),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ------------------------------
+# Áp dụng
+# ------------------------------
+def current_version(users_db=None):
+    users_db = users_db if users_db is not None else get_database()
+    doc = users_db[SCHEMA_COLLECTION].find_one({"_id": "schema"})
+    return doc["version"] if doc else 0
+
+
+def migrate(users_db=None, logs_db=None, target=None):
+    """Áp dụng các migration có phiên bản > phiên bản hiện tại (và <= target nếu có). Trả về các phiên bản đã chạy."""
+    users_db = users_db if users_db is not None else get_database()
+    logs_db = logs_db if logs_db is not None else get_logs_database()
+    version = current_version(users_db)
+    applied = []
+    for v, description, fn in MIGRATIONS:
+        if v <= version or (target is not None and v > target):
+            continue
+        print(f"⏳ Migration {v}: {description}")
+        fn(users_db, logs_db)
+        now = datetime.utcnow()
+        users_db[SCHEMA_COLLECTION].update_one(
+            {"_id": "schema"},
+            {
+                "$max": {"version": v},
+                "$set": {"updated_at": now},
+                "$push": {"history": {"version": v, "description": description, "applied_at": now}},
+            },
+            upsert=True,
+        )
+        applied.append(v)
+    if applied:
+        print(f"✅ Schema MongoDB ở phiên bản {applied[-1]}.")
+    return applied
+
+
+# ------------------------------
+# Kiểm tra kế hoạch truy vấn
+# ------------------------------
+def hot_queries(username="__explain__", email="__explain__@example.com"):
+    """Các truy vấn nóng của backend/auth.py và các trang frontend, dạng lệnh cho `explain`."""
+    queries = [
+        ("users", "users.find_one(username)", {"find": "users", "filter": {"username": username}, "limit": 1}),
+        ("users", "users.find_one(email)", {"find": "users", "filter": {"email": email}, "limit": 1}),
+        ("users", "users.find_one(email, username != ...)",
+         {"find": "users", "filter": {"email": email, "username": {"$ne": username}}, "limit": 1}),
+    ]
+    for name in LOG_COLLECTIONS:
+        queries.append(("logs", f"{name}.find(username).sort(timestamp)",
+                        {"find": name, "filter": {"username": username}, "sort": {"timestamp": -1}, "limit": 50}))
+        queries.append(("logs", f"{name}.find(username, timestamp >= ...)",
+                        {"find": name, "filter": {"username": username, "timestamp": {"$gte": datetime(2000, 1, 1)}},
+                         "sort": {"timestamp": -1}}))
+        queries.append(("logs", f"{name}.count_documents(username)",
+                        {"count": name, "query": {"username": username}}))
+    queries.append(("logs", f"{ROLLUP_COLLECTION}.find(username, source, day >= ...)",
+                    {"find": ROLLUP_COLLECTION,
+                     "filter": {"username": username, "source": "image", "day": {"$gte": datetime(2000, 1, 1)}}}))
+    queries.append(("logs", "chat_logs.delete_many(username)",
+                    {"delete": "chat_logs", "deletes": [{"q": {"username": username}, "limit": 0}]}))
+    return queries
+
+
+def _stages(node):
+    """Mọi `stage` trong cây kế hoạch (cả định dạng classic lẫn SBE)."""
+    if isinstance(node, dict):
+        if "stage" in node:
+            yield node["stage"]
+        for value in node.values():
+            yield from _stages(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _stages(value)
+
+
+def explain_hot_queries(users_db=None, logs_db=None):
+    users_db = users_db if users_db is not None else get_database()
+    logs_db = logs_db if logs_db is not None else get_logs_database()
+    report = []
+    for target, name, command in hot_queries():
+        db = users_db if target == "users" else logs_db
+        plan = db.command("explain", command, verbosity="queryPlanner")
+        stages = list(_stages(plan["queryPlanner"]["winningPlan"]))
+        report.append({"query": name, "stages": stages, "collscan": "COLLSCAN" in stages})
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="chỉ in phiên bản schema hiện tại")
+    parser.add_argument("--explain", action="store_true", help="kiểm tra kế hoạch của các truy vấn nóng")
+    parser.add_argument("--target", type=int, default=None, help="chỉ migrate tới phiên bản này")
+    args = parser.parse_args(argv)
+    connect()  # chạy tay: thử lại với backoff nếu Mongo chưa sẵn sàng
+
+    if args.status:
+        print(f"Schema hiện tại: {current_version()} / mới nhất: {SCHEMA_VERSION}")
+        return 0
+    if args.explain:
+        failed = 0
+        for row in explain_hot_queries():
+            mark = "❌" if row["collscan"] else "✅"
+            failed += row["collscan"]
+            print(f"{mark} {row['query']:<50} {' → '.join(reversed(row['stages']))}")
+        if failed:
+            print(f"{failed} truy vấn còn quét toàn collection (COLLSCAN). Chạy migration rồi kiểm tra lại.")
+        return 1 if failed else 0
+
+    if not migrate(target=args.target):
+        print(f"Schema đã ở phiên bản mới nhất ({current_version()}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,129 @@
-from ultralytics import YOLO  
-from .config import MODEL_PATH  
+import contextlib
+import hashlib
+import importlib.util
+import os
+import time
 
-def load_model():  
+import numpy as np
+from ultralytics import YOLO
+from .config import MODEL_PATH, INFERENCE_RUNTIME, MODEL_IMGSZ, QUANT_CALIB_DIR
+
+# Runtime → định dạng export của ultralytics. "torch" dùng thẳng file .pt,
+# "onnx-int8" là bản ONNX lượng tử hoá INT8 (xem backend/quantization.py)
+RUNTIMES = ("torch", "onnx", "openvino", "onnx-int8")
+
+# Gói Python mỗi runtime cần, không có trong requirements.txt (xem requirements-edge.txt).
+# Kiểm tra trước thay vì để ultralytics tự pip install lúc chạy: máy edge thường không có mạng
+RUNTIME_PACKAGES = {"onnx": ("onnxruntime",), "openvino": ("openvino",), "onnx-int8": ("onnxruntime",)}
+EXPORT_PACKAGES = {"onnx": ("onnx",), "openvino": ("openvino",)}
+
+
+def require_packages(runtime, packages):
+    missing = [p for p in packages if importlib.util.find_spec(p) is None]
+    if missing:
+        raise RuntimeError(
+            f"INFERENCE_RUNTIME={runtime} cần gói {', '.join(missing)} nhưng chưa được cài. "
+            f"Cài bằng: pip install -r requirements-edge.txt"
+        )
+
+
+def artifact_path(runtime, weights=MODEL_PATH):
+    """Đường dẫn artifact đã chuyển đổi, nằm cạnh file .pt (giống cách ultralytics tự đặt tên)."""
+    stem = os.path.splitext(weights)[0]
+    if runtime == "onnx":
+        return stem + ".onnx"
+    if runtime == "onnx-int8":
+        return stem + "_int8.onnx"
+    if runtime == "openvino":
+        return stem + "_openvino_model"
+    return weights
+
+
+@contextlib.contextmanager
+def _export_lock(path, stale_after=900):
+    """Khoá bằng file để nhiều tiến trình (worker uvicorn / worker suy luận) không export cùng lúc."""
+    lock = path + ".lock"
+    while True:
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock) > stale_after:
+                    os.remove(lock)
+                    continue
+            except OSError:
+                continue
+            time.sleep(0.5)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        with contextlib.suppress(OSError):
+            os.remove(lock)
+
+
+def export_model(runtime, weights=MODEL_PATH, imgsz=MODEL_IMGSZ):
+    """Export weights sang runtime yêu cầu ở lần dùng đầu, các lần sau dùng lại artifact đã có."""
+    target = artifact_path(runtime, weights)
+    if runtime == "torch":
+        return target
+
+    def _fresh():
+        return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(weights)
+
+    if _fresh():
+        return target
+    if runtime == "onnx-int8":
+        fp32 = export_model("onnx", weights, imgsz)
+        with _export_lock(target):
+            if not _fresh():
+                from .quantization import quantize_onnx
+                print(f"⏳ Đang lượng tử hoá INT8 {os.path.basename(fp32)} (hiệu chỉnh trên {QUANT_CALIB_DIR})...")
+                try:
+                    quantize_onnx(fp32, target, QUANT_CALIB_DIR, imgsz)
+                except ImportError as e:
+                    msg = (f"Lượng tử hoá INT8 cần gói onnx + onnxruntime ({e}). "
+                           f"Cài bằng: pip install -r requirements-edge.txt")
+                    print(f"❌ {msg}")
+                    raise RuntimeError(msg) from e
+        return target
+
+    with _export_lock(target):
+        if not _fresh():
+            require_packages(runtime, EXPORT_PACKAGES.get(runtime, ()))
+            print(f"⏳ Đang export {os.path.basename(weights)} sang {runtime}...")
+            # dynamic=True để giữ được batch động cho micro-batching / /predict/batch
+            exported = YOLO(weights).export(format=runtime, imgsz=imgsz, dynamic=True, verbose=False)
+            if os.path.abspath(exported) != os.path.abspath(target):
+                os.replace(exported, target)
+    return target
+
+
+def warmup(model, imgsz=MODEL_IMGSZ):
+    """Chạy một ảnh giả để runtime cấp phát bộ nhớ / biên dịch kernel trước request thật."""
+    dummy = np.zeros((imgsz, imgsz, 3), dtype=np.uint8)
+    model.predict(source=dummy, imgsz=imgsz, save=False, verbose=False)
+
+
+def load_model(runtime=INFERENCE_RUNTIME, weights=MODEL_PATH):
+    if runtime not in RUNTIMES:
+        raise RuntimeError(f"INFERENCE_RUNTIME không hợp lệ: {runtime} (chọn một trong {', '.join(RUNTIMES)})")
+    require_packages(runtime, RUNTIME_PACKAGES.get(runtime, ()))
+    try:
+        path = export_model(runtime, weights)
+        model = YOLO(path) if runtime == "torch" else YOLO(path, task="detect")
+    except Exception as e:
+        raise RuntimeError(f"Không thể load YOLO model từ {weights} ({runtime}): {e}")
+    warmup(model)
+    return model
+
+
+def model_version(path=MODEL_PATH, runtime=INFERENCE_RUNTIME):
+    """Định danh ngắn của model đang phục vụ (file weights + runtime), đổi khi model đổi."""
     try:
-        return YOLO(MODEL_PATH)  
-    except Exception as e:  
-        raise RuntimeError(f"Không thể load YOLO model từ {MODEL_PATH}: {e}")   
+        st = os.stat(path)
+        raw = f"{os.path.basename(path)}:{st.st_size}:{int(st.st_mtime)}:{runtime}"
+    except OSError:
+        raw = f"{os.path.basename(path)}:{runtime}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:12]
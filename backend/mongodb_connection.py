@@ -1,21 +1,80 @@
 from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure, PyMongoError
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
-# Tải các biến môi trường từ file .env  
+# Tải các biến môi trường từ file .env
 load_dotenv()
-  
-def get_database():  
+
+MONGO_CONNECT_RETRIES = int(os.getenv("MONGO_CONNECT_RETRIES", "5"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "3000"))
+USERS_DB = os.getenv("MONGO_USERS_DB", "nam_db")
+LOGS_DB = os.getenv("MONGO_LOGS_DB", "mit_detection")  # log của frontend (frontend/utils/db.py)
+
+_client = None
+_lock = threading.Lock()
+
+
+def _ping_client():
+    client = MongoClient(os.getenv("MONGO_URI"), serverSelectionTimeoutMS=MONGO_TIMEOUT_MS)
+    try:
+        client.admin.command('ping')
+    except Exception:
+        client.close()
+        raise
+    return client
+
+
+def get_client():
     """
-    Kết nối tới MongoDB Atlas và trả về database 'nam_db'.  
+    Trả về MongoClient dùng chung cho cả tiến trình.
+
+    Chưa kết nối được thì chỉ thử một lần (một ping), không thử lại: request đang phục vụ
+    trả 503 ngay thay vì chờ. Nếu luồng khác đang kết nối thì báo lỗi ngay, không xếp hàng
+    chờ khoá. Việc thử lại với backoff nằm ở connect(), do luồng nền của backend gọi.
     """
-    MONGO_URI = os.getenv("MONGO_URI")  
+    global _client
+    if _client is not None:
+        return _client
 
+    if not _lock.acquire(blocking=False):
+        raise ConnectionFailure("MongoDB đang được kết nối, vui lòng thử lại sau.")
     try:
-        client = MongoClient(MONGO_URI)
-        client.admin.command('ping')
-        print("✅ Kết nối MongoDB Atlas thành công!")  
-        return client["nam_db"]  
-    except Exception as e:  
-        print("❌ Lỗi kết nối MongoDB:", e)  
-        raise e   
+        if _client is None:
+            _client = _ping_client()
+            print("✅ Kết nối MongoDB Atlas thành công!")
+        return _client
+    finally:
+        _lock.release()
+
+
+def connect(retries=MONGO_CONNECT_RETRIES):
+    """Kết nối với tối đa `retries` lần thử, backoff giữa các lần (không giữ khoá khi chờ)."""
+    last_error = None
+    for attempt in range(1, retries + 1):
+        try:
+            return get_client()
+        except PyMongoError as e:
+            last_error = e
+            print(f"❌ Lỗi kết nối MongoDB (lần {attempt}/{retries}):", e)
+            if attempt < retries:
+                time.sleep(min(0.5 * 2 ** (attempt - 1), 5))
+    raise last_error
+
+
+def is_connected():
+    return _client is not None
+
+
+def get_database():
+    """
+    Kết nối tới MongoDB Atlas và trả về database 'nam_db'.
+    """
+    return get_client()[USERS_DB]
+
+
+def get_logs_database():
+    """Database chứa các collection log (analysis_logs, video_logs, chat_logs, compare_logs)."""
+    return get_client()[LOGS_DB]
@@ -1,56 +1,824 @@
-from fastapi import APIRouter, UploadFile, HTTPException
-from PIL import Image
+from fastapi import (
+    APIRouter, UploadFile, File, HTTPException, Query, Header, Body, Depends, Request, WebSocket, WebSocketDisconnect,
+)
+from fastapi.responses import Response, StreamingResponse
+from collections import deque
+from typing import Dict, List, Optional
+import asyncio
+import base64
+import contextlib
+import json
+import os
+import shutil
+import tempfile
+import time
 import uuid
 
-from .model_loader import load_model
-from .utils import encode_image_to_base64, decode_uploaded_file
+import cv2
+import numpy as np
+
+from .admission import AdmissionController, AdmissionRejected, ClientDisconnected, unless_disconnected
+from .auth import check_admin_key
+from .cache import ResultCache
+from .config import (
+    ROOT_DIR, MODEL_PATH, MODEL_REGISTRY, DEFAULT_MODEL, MODEL_ROUTING, INFERENCE_RUNTIME,
+    BATCH_MAX_FILES, MICROBATCH_MAX_SIZE, MICROBATCH_MAX_WAIT_MS,
+    INFERENCE_THREADS, INFERENCE_QUEUE_LIMIT, INFERENCE_WORKERS, WORKER_CORES,
+    ADMISSION_CONCURRENCY, ADMISSION_QUEUE_LIMIT, ADMISSION_DEADLINE_MS, ADMISSION_MAX_DEADLINE_MS,
+    RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_DIR, DECODE_TARGET_SIZE,
+    VIDEO_FRAME_STRIDE, VIDEO_INFLIGHT_FRAMES, WS_DEFAULT_WIDTH, WS_MAX_WIDTH, WS_DEFAULT_QUALITY,
+    TILE_SIZE, TILE_OVERLAP, TILE_NMS_IOU, TILE_MAX_COUNT, IMAGE_MAX_DIM, IMAGE_QUALITY, THUMBNAIL_MAX_DIM,
+)
+from .executor import InferencePool, PoolSaturatedError
+from .metrics import ADMISSION_EVENTS, ADMISSION_WAITING, CACHE_EVENTS, POOL_INFLIGHT, QUEUE_DEPTH, StageTimer
+from .registry import ModelNotFound, ModelRegistry, parse_pairs, resolve_weights
+from .renderer import RENDERER_VERSION, render_result
+from .tiling import count_tiles, make_tiles, merge_tile_results
+from .utils import IMAGE_FORMATS, encode_bgr_to_jpeg, encode_with_thumbnail, decode_image
 
 router = APIRouter(prefix="/predict", tags=["Predict"])
-model = load_model()
+admin_router = APIRouter(prefix="/admin/models", tags=["Admin"])
 
-@router.post("/")
-async def predict_image(file: UploadFile, conf: float = 0.5):
+# Các model được phục vụ (MODEL_REGISTRY), mặc định chỉ một model "default" = MODEL_PATH
+MODEL_SPECS = {
+    name: resolve_weights(path, ROOT_DIR) for name, path in parse_pairs(MODEL_REGISTRY).items()
+} or {"default": MODEL_PATH}
+
+cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_TTL, RESULT_CACHE_DIR)
+
+# Mọi bước nặng CPU chạy trên pool này, không chạy trên event loop.
+# Khi dùng worker, mỗi batch đang chạy giữ thêm một luồng chờ kết quả (mỗi model một pool worker).
+pool = InferencePool(INFERENCE_THREADS + INFERENCE_WORKERS * len(MODEL_SPECS), INFERENCE_QUEUE_LIMIT)
+
+# Mỗi model có micro-batcher riêng; được nạp + warm-up ở luồng nền khi app khởi động (xem start_loading()).
+# INFERENCE_WORKERS > 0: YOLO chạy ở các tiến trình worker, tiến trình API không giữ model
+registry = ModelRegistry(
+    MODEL_SPECS, DEFAULT_MODEL, parse_pairs(MODEL_ROUTING, float), INFERENCE_RUNTIME,
+    run=pool.run, batch_size=MICROBATCH_MAX_SIZE, wait_ms=MICROBATCH_MAX_WAIT_MS,
+    workers=INFERENCE_WORKERS, cores=WORKER_CORES,
+)
+_started_at = None
+
+# Hàng đợi có giới hạn + deadline phía trước /predict: quá tải thì từ chối sớm, không nhận rồi bỏ
+admission = AdmissionController(ADMISSION_CONCURRENCY, ADMISSION_QUEUE_LIMIT)
+
+QUEUE_DEPTH.labels().set_function(lambda: sum(e.batcher.stats()["queue_depth"] for e in registry))
+POOL_INFLIGHT.labels().set_function(lambda: pool.stats()["inflight"])
+ADMISSION_WAITING.labels().set_function(lambda: admission.stats()["waiting"])
+
+
+# ------------------------------
+# Vòng đời model
+# ------------------------------
+def start_loading():
+    """Nạp model ở luồng nền để uvicorn nhận request ngay (liveness) trong lúc chờ readiness."""
+    global _started_at
+    if _started_at is None:
+        _started_at = time.time()
+        registry.start_loading()
+
+
+def shutdown():
+    registry.shutdown()
+    pool.shutdown()
+
+
+def is_ready():
+    return registry.default_entry.ready.is_set()
+
+
+def readiness():
+    default = registry.default_entry
+    return {
+        "model_ready": default.ready.is_set(),
+        "model_version": default.version,
+        "error": default.error,
+        "load_seconds": default.load_seconds,
+        "models": {e.name: e.ready.is_set() for e in registry},
+    }
+
+
+def _select_model(name=None, route_key=None):
+    """Model theo tên client chọn, hoặc theo trọng số A/B; 404 nếu không có, 503 nếu chưa nạp xong."""
+    try:
+        entry = registry.route(name, route_key)
+    except ModelNotFound:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Không có model '{name}'. Các model hiện có: {', '.join(registry.names())}.",
+        )
+    if not entry.ready.is_set():
+        detail = "Model đang khởi động, vui lòng thử lại sau."
+        if entry.error:
+            detail = f"Không nạp được model {entry.name}: {entry.error}"
+        raise HTTPException(status_code=503, detail=detail, headers={"Retry-After": "5"})
+    return entry
+
+
+def _predict_tiled(entry, img, conf, tile_size, overlap):
+    """Chia ô, đưa tất cả ô qua model trong một batch, rồi gộp về ảnh gốc bằng NMS liên ô."""
+    tiles, offsets = make_tiles(img, tile_size, overlap, TILE_MAX_COUNT)
+    results = entry.predict_many(list(tiles), [conf] * len(tiles))
+    return merge_tile_results(results, offsets, img, TILE_NMS_IOU)
+
+
+def _overloaded(retry_after=1):
+    return HTTPException(
+        status_code=503,
+        detail="Máy chủ đang quá tải, vui lòng thử lại sau.",
+        headers={"Retry-After": str(retry_after)},
+    )
+
+
+async def _map_on_pool(fn, items):
+    """Chạy `fn` trên từng phần tử, chia thành tối đa `pool.max_workers` việc song song."""
+    n = min(pool.max_workers, len(items)) or 1
+    chunks = [items[i::n] for i in range(n)]
+    parts = await asyncio.gather(*(pool.run(lambda c: [fn(x) for x in c], c) for c in chunks))
+    out = [None] * len(items)
+    for i, part in enumerate(parts):
+        out[i::n] = part
+    return out
+
+
+DEFAULT_ENCODE = {
+    "max_dim": IMAGE_MAX_DIM, "quality": IMAGE_QUALITY, "progressive": False,
+    "image_format": "jpeg", "thumbnail": 0,
+}
+
+
+def encode_options(
+    max_dim: int = Query(IMAGE_MAX_DIM, ge=0, le=8192, description="cạnh dài tối đa của ảnh trả về (0 = không thu nhỏ)"),
+    quality: int = Query(IMAGE_QUALITY, ge=30, le=95),
+    progressive: bool = Query(False, description="JPEG progressive"),
+    image_format: str = Query("jpeg", description="jpeg | webp"),
+    thumbnail: int = Query(0, ge=0, le=THUMBNAIL_MAX_DIM, description="cạnh dài thumbnail (0 = không tạo)"),
+):
+    """Tuỳ chọn mã hoá ảnh annotate theo kích thước client thực sự hiển thị."""
+    if image_format not in IMAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"image_format chỉ nhận: {', '.join(IMAGE_FORMATS)}.")
+    return {
+        "max_dim": max_dim, "quality": quality, "progressive": progressive,
+        "image_format": image_format, "thumbnail": thumbnail,
+    }
+
+
+def _format_result(result, render=True, layout="rows", scale=1.0, timer=None, encode=None):
+    """
+    Chuyển kết quả YOLO của một ảnh thành {detections | columns, counts, encoded, thumb, media_type}.
+
+    Tensor box được chuyển sang numpy một lần cho cả ảnh thay vì từng box.
+    `layout="columnar"` trả về các mảng song song (xywh, class_id, confidence),
+    `render=False` bỏ qua hoàn toàn bước vẽ + mã hoá ảnh (encoded=None).
+    `scale` là tỉ lệ ảnh đã giải mã so với ảnh gốc, dùng để đưa toạ độ về ảnh gốc.
+    `timer` (StageTimer) nhận thời gian các bước postprocess / render / encode.
+    `encode` là tuỳ chọn mã hoá (xem encode_options); ảnh được vẽ sẵn ở kích thước `max_dim`.
+    """
+    timer = timer or StageTimer()
+    encode = encode or DEFAULT_ENCODE
+    with timer.stage("postprocess"):
+        boxes = result.boxes
+        names = result.names
+        xywh = boxes.xywh.cpu().numpy()
+        class_ids = boxes.cls.cpu().numpy().astype(np.int64)
+        confs = np.round(boxes.conf.cpu().numpy().astype(np.float64), 3).tolist()
+
+        hist = np.bincount(class_ids, minlength=len(names))
+        item = {"counts": {names[i]: int(n) for i, n in enumerate(hist.tolist())}}
+
+        if layout == "columnar":
+            item["columns"] = {
+                "xywh": np.round(xywh.astype(np.float64) / scale, 2).tolist(),
+                "class_id": class_ids.tolist(),
+                "confidence": confs,
+                "names": {int(k): v for k, v in names.items()},
+            }
+        else:
+            labels = [names[c] for c in class_ids.tolist()]
+            item["detections"] = [
+                {"label": label, "confidence": c} for label, c in zip(labels, confs)
+            ]
+
+    item.update(encoded=None, thumb=None, media_type=None)
+    if render:
+        # vẽ thẳng lên ảnh đã giải mã (BGR), ở kích thước trả về, rồi mã hoá bằng cv2, không qua PIL
+        with timer.stage("render"):
+            annotated = render_result(result, max_dim=encode["max_dim"])
+        with timer.stage("encode"):
+            item["encoded"], item["thumb"] = encode_with_thumbnail(
+                annotated, encode["image_format"], encode["quality"], encode["progressive"],
+                thumb_dim=encode["thumbnail"],
+            )
+        item["media_type"] = IMAGE_FORMATS[encode["image_format"]][1]
+
+    return item
+
+
+# ------------------------------
+# Định dạng phản hồi
+# ------------------------------
+# base64    : JSON {image: base64 JPEG, detections} – mặc định, tương thích cũ
+# json      : JSON {detections}, không vẽ ảnh
+# jpeg      : ảnh annotate thô (image/jpeg, hoặc image/webp khi image_format=webp)
+# multipart : multipart/mixed gồm phần JSON + phần ảnh (+ phần thumbnail nếu có)
+RESPONSE_FORMATS = ("base64", "json", "jpeg", "multipart")
+LAYOUTS = ("rows", "columnar")
+_BINARY_KEYS = ("encoded", "thumb", "media_type")
+
+
+def _negotiate_format(fmt, accept):
+    if fmt:
+        if fmt not in RESPONSE_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"format không hợp lệ, chọn một trong: {', '.join(RESPONSE_FORMATS)}.",
+            )
+        return fmt
+    accept = (accept or "").lower()
+    if "multipart/" in accept:
+        return "multipart"
+    if "image/jpeg" in accept and "application/json" not in accept:
+        return "jpeg"
+    return "base64"
+
+
+def _check_layout(layout):
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout không hợp lệ, chọn một trong: {', '.join(LAYOUTS)}.")
+
+
+def _json_body(item, fmt):
+    body = {k: v for k, v in item.items() if k not in _BINARY_KEYS}
+    if fmt == "base64":
+        images = {"image": base64.b64encode(item["encoded"]).decode(), "image_type": item["media_type"]}
+        if item["thumb"] is not None:
+            images["thumbnail"] = base64.b64encode(item["thumb"]).decode()
+        body = {**images, **body}
+    return body
+
+
+def _build_response(item, fmt):
+    if fmt in ("base64", "json"):
+        return _json_body(item, fmt)
+
+    headers = {"X-Detection-Count": str(sum(item["counts"].values()))}
+    if fmt == "jpeg":
+        return Response(content=item["encoded"], media_type=item["media_type"], headers=headers)
+
+    boundary = uuid.uuid4().hex
+    meta = json.dumps(_json_body(item, "json"), ensure_ascii=False).encode()
+    parts = [
+        f"--{boundary}\r\nContent-Type: application/json; charset=utf-8\r\n\r\n".encode(), meta,
+        f"\r\n--{boundary}\r\nContent-Type: {item['media_type']}\r\n\r\n".encode(), item["encoded"],
+    ]
+    if item["thumb"] is not None:
+        parts += [
+            f"\r\n--{boundary}\r\nContent-Type: {item['media_type']}\r\n"
+            f"Content-Disposition: inline; name=\"thumbnail\"\r\n\r\n".encode(),
+            item["thumb"],
+        ]
+    parts.append(f"\r\n--{boundary}--\r\n".encode())
+    body = b"".join(parts)
+    return Response(content=body, media_type=f"multipart/mixed; boundary={boundary}", headers=headers)
+
+
+def _with_timing(out, timer, response, entry):
+    """Ghi thời gian các bước vào histogram, header Server-Timing và model đã phục vụ."""
+    timer.observe(entry.name)
+    target = out if isinstance(out, Response) else response
+    target.headers["Server-Timing"] = timer.server_timing()
+    target.headers["X-Model"] = entry.name
+    return out
+
+
+async def _run_pipeline(request, entry, data, conf, tile, tile_size, tile_overlap, render, layout, encode, timer):
+    """Giải mã → YOLO → vẽ/mã hoá cho một ảnh đã được nhận xử lý."""
     try:
-        img = decode_uploaded_file(await file.read())
+        # Chế độ chia ô cần đủ độ phân giải gốc, không giải mã thu nhỏ
+        with timer.stage("decode"):
+            img, scale = await pool.run(decode_image, data, 0 if tile else DECODE_TARGET_SIZE)
+    except PoolSaturatedError:
+        raise _overloaded()
     except Exception:
         raise HTTPException(status_code=400, detail="Không đọc được ảnh tải lên.")
 
+    if tile:
+        n_tiles = count_tiles(img.shape[0], img.shape[1], tile_size, tile_overlap)
+        if n_tiles > TILE_MAX_COUNT:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Ảnh {img.shape[1]}×{img.shape[0]} với tile_size={tile_size}, tile_overlap={tile_overlap} "
+                       f"cho {n_tiles} ô, vượt giới hạn {TILE_MAX_COUNT}. Hãy tăng tile_size hoặc giảm tile_overlap.",
+            )
+
     try:
-        results = model.predict(source=img, conf=conf, save=False, verbose=False)
+        # inference gồm cả thời gian chờ gom batch trong micro-batcher;
+        # client ngắt kết nối → huỷ, ảnh còn trong hàng đợi batcher bị bỏ
+        started = time.perf_counter()
+        with timer.stage("inference"):
+            if tile:
+                job = pool.run(_predict_tiled, entry, img, conf, tile_size, tile_overlap)
+            else:
+                job = entry.batcher.submit(img, conf)
+            result = await unless_disconnected(job, request.is_disconnected)
+        entry.observe_request(time.perf_counter() - started)
+        item = await pool.run(_format_result, result, render, layout, scale, timer, encode)
+        item["model"] = entry.name
+        return item
+    except (PoolSaturatedError, ClientDisconnected):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Lỗi YOLO: {e}")
 
-    boxes = results[0].boxes
-    predictions = []
-    detections = []
-
-    for b in boxes:
-        xywh = b.xywh[0].tolist()
-        class_id = int(b.cls[0])
-        label = results[0].names[class_id]
-        conf_score = float(b.conf[0])
-
-        detections.append({
-            "label": label,
-            "confidence": round(conf_score, 3)
-        })
-
-        # JSON format 
-        predictions.append({
-            "x": float(xywh[0]),
-            "y": float(xywh[1]),
-            "width": float(xywh[2]),
-            "height": float(xywh[3]),
-            "confidence": conf_score,
-            "class": label,
-            "class_id": class_id,
-            "detection_id": str(uuid.uuid4())  
-        })
-
-    # tạo ảnh annotate
-    annotated_np = results[0].plot()
-    annotated = Image.fromarray(annotated_np)
-    annotated_b64 = encode_image_to_base64(annotated)
-
-    return {"image": annotated_b64, "detections": detections}
+
+@router.post("/")
+async def predict_image(
+    request: Request,
+    response: Response,
+    file: UploadFile,
+    conf: float = 0.5,
+    response_format: Optional[str] = Query(None, alias="format", description="base64 | json | jpeg | multipart"),
+    layout: str = Query("rows", description="rows | columnar"),
+    tile: bool = Query(False, description="chia ảnh lớn thành các ô chồng lấn để không mất trái nhỏ"),
+    tile_size: int = Query(TILE_SIZE, ge=160, le=2048),
+    tile_overlap: float = Query(TILE_OVERLAP, ge=0.0, le=0.5),
+    encode: dict = Depends(encode_options),
+    deadline_ms: int = Query(
+        ADMISSION_DEADLINE_MS, ge=100, le=ADMISSION_MAX_DEADLINE_MS,
+        description="thời gian tối đa client chờ (ms); không kịp thì trả 503 ngay",
+    ),
+    model_name: Optional[str] = Query(None, alias="model", description="tên model (xem /predict/models)"),
+    x_route_key: Optional[str] = Header(None, description="khoá chia A/B cố định, ví dụ username"),
+    accept: Optional[str] = Header(None),
+):
+    fmt = _negotiate_format(response_format, accept)
+    _check_layout(layout)
+    entry = _select_model(model_name, x_route_key)
+    timer = StageTimer()
+    deadline = time.monotonic() + deadline_ms / 1000
+    render = fmt != "json"
+    with timer.stage("read"):
+        data = await file.read()
+    tiling = (tile_size, tile_overlap) if tile else None
+
+    # Ảnh đã gặp với cùng model + tham số → trả ngay, bỏ qua giải mã / YOLO / vẽ
+    key = None
+    if cache.enabled:
+        with timer.stage("cache"):
+            key = await asyncio.to_thread(
+                cache.make_key, data, entry.name, entry.version, RENDERER_VERSION, conf, layout, render, tiling,
+                sorted(encode.items()) if render else None,
+            )
+            # Tầng đĩa mở file + unpickle cả ảnh đã mã hoá → không chạy trên event loop
+            item = await asyncio.to_thread(cache.get, key) if cache.disk_dir else cache.get(key)
+        CACHE_EVENTS.inc(result="miss" if item is None else "hit")
+        if item is not None:
+            return _with_timing(_build_response(item, fmt), timer, response, entry)
+
+    queued_at = time.perf_counter()
+    try:
+        async with admission.admit(deadline, request.is_disconnected):
+            timer.add("queue", time.perf_counter() - queued_at)
+            ADMISSION_EVENTS.inc(result="admitted")
+            item = await _run_pipeline(
+                request, entry, data, conf, tile, tile_size, tile_overlap, render, layout, encode, timer,
+            )
+    except AdmissionRejected as e:
+        ADMISSION_EVENTS.inc(result=e.reason)
+        raise _overloaded(e.retry_after)
+    except ClientDisconnected:
+        ADMISSION_EVENTS.inc(result="disconnected")
+        return Response(status_code=499)  # client đã đi, không ai đọc phản hồi
+    except PoolSaturatedError:
+        raise _overloaded()
+
+    if key is not None:
+        if cache.disk_dir:
+            await asyncio.to_thread(cache.put, key, item)
+        else:
+            cache.put(key, item)
+    return _with_timing(_build_response(item, fmt), timer, response, entry)
+
+
+@router.get("/stats")
+def batcher_stats():
+    return {
+        "models": {e.name: {"batcher": e.batcher.stats(), "workers": e.stats()["workers"]} for e in registry},
+        "pool": pool.stats(),
+        "cache": cache.stats(),
+        "admission": admission.stats(),
+    }
+
+
+# ------------------------------
+# MODEL REGISTRY: THỐNG KÊ / HOT-SWAP / CHIA A/B
+# ------------------------------
+@router.get("/models")
+def list_models():
+    """Các model đang phục vụ, trọng số A/B, độ trễ và số box nhận dạng theo từng model."""
+    return registry.stats()
+
+
+@admin_router.post("/{name}/reload", status_code=202)
+def reload_model(
+    name: str,
+    weights: Optional[str] = Body(None, embed=True, description="file .pt mới (tương đối từ thư mục gốc)"),
+    x_admin_key: Optional[str] = Header(None),
+):
+    """Nạp lại model (hoặc thêm model mới khi có `weights`) mà không khởi động lại tiến trình."""
+    check_admin_key(x_admin_key)
+    if weights:
+        weights = resolve_weights(weights, ROOT_DIR)
+        if not weights.endswith(".pt") or not os.path.isfile(weights):
+            raise HTTPException(status_code=400, detail="weights phải là file .pt có trên máy chủ.")
+    try:
+        entry = registry.reload(name, weights)
+    except ModelNotFound:
+        raise HTTPException(status_code=404, detail=f"Không có model '{name}' (gửi kèm weights để thêm mới).")
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "loading", "model": entry.name, "serving_version": entry.version if entry.ready.is_set() else None}
+
+
+@admin_router.put("/routing")
+def set_routing(weights: Dict[str, float] = Body(...), x_admin_key: Optional[str] = Header(None)):
+    """Đặt trọng số chia request A/B, ví dụ {"v8n": 80, "v8s": 20}; model không nêu tên nhận 0."""
+    check_admin_key(x_admin_key)
+    try:
+        return {"routing": registry.set_routing(weights)}
+    except ModelNotFound as e:
+        raise HTTPException(status_code=404, detail=f"Không có model: {e}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ------------------------------
+# API: NHẬN DẠNG NHIỀU ẢNH (1 LẦN FORWARD)
+# ------------------------------
+@router.post("/batch")
+async def predict_batch(
+    request: Request,
+    response: Response,
+    files: List[UploadFile] = File(...),
+    conf: float = 0.5,
+    response_format: str = Query("base64", alias="format", description="base64 | json"),
+    layout: str = Query("rows", description="rows | columnar"),
+    encode: dict = Depends(encode_options),
+    deadline_ms: int = Query(
+        ADMISSION_DEADLINE_MS, ge=100, le=ADMISSION_MAX_DEADLINE_MS,
+        description="thời gian tối đa client chờ (ms); không kịp thì trả 503 ngay",
+    ),
+    model_name: Optional[str] = Query(None, alias="model"),
+    x_route_key: Optional[str] = Header(None),
+):
+    _check_layout(layout)
+    if response_format not in ("base64", "json"):
+        raise HTTPException(status_code=400, detail="format của /predict/batch chỉ hỗ trợ base64 hoặc json.")
+    if not files:
+        raise HTTPException(status_code=400, detail="Chưa có ảnh nào được tải lên.")
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Tối đa {BATCH_MAX_FILES} ảnh cho mỗi lần gửi.")
+    entry = _select_model(model_name, x_route_key)
+
+    timer = StageTimer()
+    deadline = time.monotonic() + deadline_ms / 1000
+    # Đọc & giải mã song song trên pool
+    with timer.stage("read"):
+        raw = await asyncio.gather(*(f.read() for f in files))
+
+    def _try_decode(data):
+        try:
+            return decode_image(data, DECODE_TARGET_SIZE)
+        except Exception:
+            return None
+
+    # Cùng hàng đợi admission với /predict, mỗi ảnh chiếm một chỗ
+    queued_at = time.perf_counter()
+    try:
+        async with admission.admit(deadline, request.is_disconnected, weight=len(files)):
+            timer.add("queue", time.perf_counter() - queued_at)
+            ADMISSION_EVENTS.inc(result="admitted")
+            with timer.stage("decode"):
+                decoded = await _map_on_pool(_try_decode, list(raw))
+            for f, d in zip(files, decoded):
+                if d is None:
+                    raise HTTPException(status_code=400, detail=f"Không đọc được ảnh tải lên: {f.filename}")
+            imgs = [img for img, _ in decoded]
+            scales = [scale for _, scale in decoded]
+
+            # Toàn bộ ảnh đi qua model trong một lần gọi → YOLO gom thành một batch
+            try:
+                with timer.stage("inference"):
+                    results = await pool.run(entry.predict_many, imgs, [conf] * len(imgs))
+                render = response_format != "json"
+                with timer.stage("format"):
+                    formatted = await _map_on_pool(
+                        lambda rs: _format_result(rs[0], render, layout, rs[1], encode=encode),
+                        list(zip(results, scales)),
+                    )
+            except PoolSaturatedError:
+                raise
+            except Exception as e:
+                raise HTTPException(status_code=500, detail=f"Lỗi YOLO: {e}")
+    except AdmissionRejected as e:
+        ADMISSION_EVENTS.inc(result=e.reason)
+        raise _overloaded(e.retry_after)
+    except ClientDisconnected:
+        ADMISSION_EVENTS.inc(result="disconnected")
+        return Response(status_code=499)
+    except PoolSaturatedError:
+        raise _overloaded()
+
+    return _with_timing({
+        "model": entry.name,
+        "results": [
+            {"file_name": f.filename, **_json_body(item, response_format)}
+            for f, item in zip(files, formatted)
+        ],
+    }, timer, response, entry)
+
+
+# ------------------------------
+# API: NHẬN DẠNG VIDEO (STREAM KẾT QUẢ THEO KHUNG HÌNH)
+# ------------------------------
+VIDEO_STREAM_FORMATS = ("ndjson", "sse")
+
+
+async def _run_with_backpressure(fn, *args):
+    """Như pool.run nhưng chờ thay vì báo lỗi khi pool đầy – dùng khi phản hồi stream đã bắt đầu."""
+    while True:
+        try:
+            return await pool.run(fn, *args)
+        except PoolSaturatedError:
+            await asyncio.sleep(0.05)
+
+
+def _save_upload(upload, suffix):
+    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=suffix)
+    with tmp:
+        shutil.copyfileobj(upload.file, tmp, 1024 * 1024)
+    return tmp.name
+
+
+def _open_video(path):
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        cap.release()
+        return None, 0.0, 0
+    return cap, cap.get(cv2.CAP_PROP_FPS) or 0.0, int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+
+
+def _read_strided(cap, stride):
+    """Bỏ qua (grab, không giải mã màu) stride-1 khung, rồi đọc khung kế tiếp."""
+    for _ in range(stride - 1):
+        if not cap.grab():
+            return None
+    ok, frame = cap.read()
+    return frame if ok else None
+
+
+async def _video_events(entry, cap, path, fps, total_frames, conf, stride, max_frames):
+    """
+    Đọc video tuần tự, giữ tối đa VIDEO_INFLIGHT_FRAMES khung đang suy luận cùng lúc
+    (micro-batcher gom chúng thành batch), trả kết quả theo đúng thứ tự khung.
+    Bộ nhớ chỉ phụ thuộc số khung đang xử lý, không phụ thuộc độ dài video.
+    """
+    inflight = deque()
+    totals = {}
+    sent = 0
+    index = -stride
+    started = time.perf_counter()
+
+    async def _detect(frame):
+        # Batch bị từ chối vì pool đầy (do /predict) → chờ rồi gửi lại, không cắt ngang stream
+        while True:
+            try:
+                result = await entry.batcher.submit(frame, conf)
+                break
+            except PoolSaturatedError:
+                await asyncio.sleep(0.05)
+        return await _run_with_backpressure(_format_result, result, False)
+
+    def _event(idx, item):
+        for k, v in item["counts"].items():
+            totals[k] = totals.get(k, 0) + v
+        return {
+            "frame": idx,
+            "time_s": round(idx / fps, 3) if fps else None,
+            "detections": item["detections"],
+            "counts": item["counts"],
+        }
+
+    try:
+        yield {"event": "start", "fps": fps, "total_frames": total_frames, "stride": stride}
+        while max_frames <= 0 or sent + len(inflight) < max_frames:
+            frame = await _run_with_backpressure(_read_strided, cap, stride)
+            if frame is None:
+                break
+            index += stride
+            inflight.append((index, asyncio.ensure_future(_detect(frame))))
+            if len(inflight) >= VIDEO_INFLIGHT_FRAMES:
+                idx, task = inflight.popleft()
+                yield _event(idx, await task)
+                sent += 1
+        while inflight:
+            idx, task = inflight.popleft()
+            yield _event(idx, await task)
+            sent += 1
+        yield {
+            "event": "end",
+            "frames_processed": sent,
+            "counts": totals,
+            "elapsed_s": round(time.perf_counter() - started, 3),
+        }
+    except Exception as e:
+        yield {"event": "error", "detail": f"Lỗi YOLO: {e}"}
+    finally:
+        for _, task in inflight:
+            task.cancel()
+        cap.release()
+        with contextlib.suppress(OSError):
+            os.remove(path)
+
+
+async def _encode_stream(events, fmt):
+    async for ev in events:
+        line = json.dumps(ev, ensure_ascii=False)
+        if fmt == "sse":
+            name = ev.get("event", "frame")
+            yield f"event: {name}\ndata: {line}\n\n"
+        else:
+            yield line + "\n"
+
+
+@router.post("/video")
+async def predict_video(
+    file: UploadFile,
+    conf: float = 0.5,
+    stride: int = Query(VIDEO_FRAME_STRIDE, ge=1, description="chỉ nhận dạng 1 trong mỗi `stride` khung"),
+    max_frames: int = Query(0, ge=0, description="số khung tối đa được nhận dạng (0 = cả video)"),
+    stream_format: Optional[str] = Query(None, alias="format", description="ndjson | sse"),
+    model_name: Optional[str] = Query(None, alias="model"),
+    accept: Optional[str] = Header(None),
+    x_route_key: Optional[str] = Header(None),
+):
+    fmt = stream_format or ("sse" if "text/event-stream" in (accept or "").lower() else "ndjson")
+    if fmt not in VIDEO_STREAM_FORMATS:
+        raise HTTPException(status_code=400, detail="format của /predict/video chỉ hỗ trợ ndjson hoặc sse.")
+    entry = _select_model(model_name, x_route_key)
+
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    try:
+        path = await pool.run(_save_upload, file, suffix)
+        cap, fps, total_frames = await pool.run(_open_video, path)
+    except PoolSaturatedError:
+        raise _overloaded()
+    if cap is None:
+        with contextlib.suppress(OSError):
+            os.remove(path)
+        raise HTTPException(status_code=400, detail="Không đọc được video tải lên.")
+
+    events = _video_events(entry, cap, path, fps, total_frames, conf, stride, max_frames)
+    media_type = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _encode_stream(events, fmt),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ------------------------------
+# WEBSOCKET: NHẬN DẠNG THỜI GIAN THỰC (WEBCAM)
+# ------------------------------
+# Giao thức:
+#   client → server  text   {"type": "config", "width": 640, "quality": 70, "conf": 0.5, "annotate": true}
+#   client → server  binary khung hình JPEG
+#   server → client  text   {"type": "config", ...}  – tham số đã thương lượng
+#   server → client  text   {"type": "result", "seq", "detections", "counts", "latency_ms", "fps", "dropped", ...}
+#   server → client  binary ảnh annotate JPEG (khi annotate=true), ngay sau result tương ứng
+# Server luôn xử lý khung mới nhất; khung đến trong lúc đang bận sẽ thay thế khung cũ (bị bỏ).
+WS_MIN_WIDTH = 160
+
+
+def _negotiate_ws(session, cfg):
+    if "width" in cfg:
+        session["width"] = max(WS_MIN_WIDTH, min(int(cfg["width"]), WS_MAX_WIDTH))
+    if "quality" in cfg:
+        session["quality"] = max(30, min(int(cfg["quality"]), 95))
+    if "conf" in cfg:
+        session["conf"] = max(0.01, min(float(cfg["conf"]), 1.0))
+    if "annotate" in cfg:
+        session["annotate"] = bool(cfg["annotate"])
+    return {"type": "config", **session}
+
+
+def _ws_decode(data, width):
+    img, _ = decode_image(data, width)
+    h, w = img.shape[:2]
+    if max(h, w) > width:
+        ratio = width / max(h, w)
+        img = cv2.resize(img, (round(w * ratio), round(h * ratio)), interpolation=cv2.INTER_AREA)
+    return img
+
+
+def _ws_render(result, annotate, quality):
+    item = _format_result(result, render=False)
+    if annotate:
+        item["encoded"] = encode_bgr_to_jpeg(render_result(result), quality)
+    return item
+
+
+@router.websocket("/ws")
+async def predict_ws(ws: WebSocket, conf: float = 0.5, model: Optional[str] = None):
+    await ws.accept()
+    try:
+        entry = _select_model(model)
+    except HTTPException as e:
+        await ws.close(code=1013, reason=str(e.detail))
+        return
+
+    session = {"width": WS_DEFAULT_WIDTH, "quality": WS_DEFAULT_QUALITY, "conf": conf, "annotate": True}
+    latest = {"data": None, "received_at": 0.0, "seq": 0}
+    counters = {"received": 0, "processed": 0, "dropped": 0}
+    has_frame = asyncio.Event()
+    send_lock = asyncio.Lock()
+
+    async def send_json(obj):
+        async with send_lock:
+            await ws.send_text(json.dumps(obj, ensure_ascii=False))
+
+    async def receiver():
+        while True:
+            msg = await ws.receive()
+            if msg["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(msg.get("code", 1000))
+            if msg.get("bytes") is not None:
+                counters["received"] += 1
+                if latest["data"] is not None:
+                    counters["dropped"] += 1  # khung cũ chưa kịp xử lý → bỏ
+                latest.update(data=msg["bytes"], received_at=time.perf_counter(), seq=counters["received"])
+                has_frame.set()
+            elif msg.get("text"):
+                try:
+                    cfg = json.loads(msg["text"])
+                    await send_json(_negotiate_ws(session, cfg))
+                except (ValueError, TypeError) as e:
+                    await send_json({"type": "error", "detail": f"Cấu hình không hợp lệ: {e}"})
+
+    async def processor():
+        fps = None
+        last_done = None
+        while True:
+            await has_frame.wait()
+            has_frame.clear()
+            data, received_at, seq = latest["data"], latest["received_at"], latest["seq"]
+            latest["data"] = None
+            if data is None:
+                continue
+
+            opts = dict(session)
+            try:
+                img = await pool.run(_ws_decode, data, opts["width"])
+                result = await entry.batcher.submit(img, opts["conf"])
+                item = await pool.run(_ws_render, result, opts["annotate"], opts["quality"])
+            except PoolSaturatedError:
+                counters["dropped"] += 1
+                continue
+            except Exception as e:
+                await send_json({"type": "error", "seq": seq, "detail": f"Lỗi xử lý khung: {e}"})
+                continue
+
+            now = time.perf_counter()
+            if last_done is not None:
+                inst = 1.0 / max(now - last_done, 1e-6)
+                fps = inst if fps is None else 0.8 * fps + 0.2 * inst
+            last_done = now
+            counters["processed"] += 1
+
+            async with send_lock:
+                await ws.send_text(json.dumps({
+                    "type": "result",
+                    "seq": seq,
+                    "detections": item["detections"],
+                    "counts": item["counts"],
+                    "width": img.shape[1],
+                    "height": img.shape[0],
+                    "latency_ms": round((now - received_at) * 1000, 1),
+                    "fps": round(fps, 2) if fps else None,
+                    **counters,
+                }, ensure_ascii=False))
+                if item["encoded"] is not None:
+                    await ws.send_bytes(item["encoded"])
+
+    tasks = [asyncio.ensure_future(receiver()), asyncio.ensure_future(processor())]
+    try:
+        await send_json({"type": "config", **session})
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for t in done:
+            t.result()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for t in tasks:
+            t.cancel()
 #code:end
\ No newline at end of file
@@ -0,0 +1,205 @@
+"""
+Profiling theo yêu cầu cho /predict và /auth.
+
+Một request được profile khi:
+  - có `?profile=1` kèm header `X-Admin-Key` đúng ADMIN_API_KEY, hoặc
+  - được chọn ngẫu nhiên theo PROFILE_SAMPLE_RATE.
+
+Dùng profiler thống kê (lấy mẫu stack mọi luồng mỗi PROFILE_INTERVAL_MS) thay vì cProfile:
+phần việc nặng của request chạy trên pool/threadpool chứ không chỉ trên event loop,
+và chi phí lấy mẫu cố định, không phụ thuộc số lời gọi hàm. Kết quả lưu ở PROFILE_DIR:
+  <request_id>.folded – collapsed stacks (mở bằng speedscope / flamegraph.pl)
+  <request_id>.json   – thông tin request + top hàm
+Giới hạn: profiler lấy mẫu mọi luồng của tiến trình, nên khi có request khác chạy song song,
+profile cũng chứa phần việc của chúng trên pool. Meta JSON ghi số request HTTP đang xử lý
+(không kể request này) lúc bắt đầu/kết thúc (`concurrent_at_start`/`concurrent_at_end`) để biết
+profile có "sạch" hay không; muốn profile sạch thì gửi ?profile=1 lúc tải thấp.
+Khi tắt (rate = 0, không có ?profile), middleware chỉ kiểm tra tham số rồi chuyển tiếp.
+"""
+import glob
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from .auth import check_admin_key
+from .metrics import HTTP_INFLIGHT
+from .config import ADMIN_API_KEY, PROFILE_SAMPLE_RATE, PROFILE_INTERVAL_MS, PROFILE_DIR, PROFILE_MAX_FILES
+
+PROFILED_PREFIXES = ("/predict", "/auth")
+
+# Luồng đang chờ việc (pool rảnh) không nói gì về request → bỏ mẫu có lá là các hàm này
+_IDLE_LEAVES = {("threading.py", "wait"), ("queue.py", "get"), ("thread.py", "_worker")}
+
+router = APIRouter(prefix="/admin/profiles", tags=["Admin"])
+
+
+class SamplingProfiler:
+    """Lấy mẫu stack của mọi luồng (trừ chính nó) ở một luồng nền."""
+
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            self.samples += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                code = frame.f_code
+                if (os.path.basename(code.co_filename), code.co_name) in _IDLE_LEAVES:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if tid not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack.append(names.get(tid, str(tid)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def folded(self):
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+    def top(self, limit=20):
+        """Top hàm theo số mẫu đang chạy chính nó (self) và nằm trong stack (inclusive)."""
+        own, inclusive = Counter(), Counter()
+        for stack, n in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += n
+            for f in set(frames):
+                inclusive[f] += n
+        return {
+            "self": own.most_common(limit),
+            "inclusive": inclusive.most_common(limit),
+        }
+
+
+def _should_profile(request):
+    if not request.url.path.startswith(PROFILED_PREFIXES):
+        return None
+    if request.query_params.get("profile") in ("1", "true"):
+        key = request.headers.get("x-admin-key")
+        if ADMIN_API_KEY and key and hmac.compare_digest(key, ADMIN_API_KEY):
+            return "requested"
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+
+def _prune():
+    files = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), key=os.path.getmtime)
+    for meta in files[:max(0, len(files) - PROFILE_MAX_FILES)]:
+        for path in (meta, meta[:-len(".json")] + ".folded"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _save(request_id, meta, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{request_id}.folded"), "w", encoding="utf-8") as f:
+        f.write(profiler.folded())
+    with open(os.path.join(PROFILE_DIR, f"{request_id}.json"), "w", encoding="utf-8") as f:
+        json.dump({**meta, "top": profiler.top()}, f, ensure_ascii=False, indent=2)
+    _prune()
+
+
+async def profile_requests(request, call_next):
+    """Middleware HTTP: profile request được chọn, ghi file và trả `X-Profile-Id`."""
+    if PROFILE_SAMPLE_RATE <= 0 and "profile" not in request.query_params:
+        return await call_next(request)
+    reason = _should_profile(request)
+    if reason is None:
+        return await call_next(request)
+
+    request_id = uuid.uuid4().hex
+    # record_metrics (middleware ngoài cùng) đã tính request này vào HTTP_INFLIGHT
+    concurrent_at_start = max(0, int(HTTP_INFLIGHT.total()) - 1)
+    profiler = SamplingProfiler().start()
+    started = time.time()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Profile-Id"] = request_id
+        return response
+    finally:
+        profiler.stop()
+        meta = {
+            "request_id": request_id,
+            "method": request.method,
+            "path": request.url.path,
+            "query": str(request.url.query),
+            "status": status,
+            "reason": reason,
+            "started_at": started,
+            "duration_ms": round((time.time() - started) * 1000, 1),
+            "interval_ms": PROFILE_INTERVAL_MS,
+            "samples": profiler.samples,
+            "concurrent_at_start": concurrent_at_start,
+            "concurrent_at_end": max(0, int(HTTP_INFLIGHT.total()) - 1),
+        }
+        # Ghi file ở luồng riêng, không giữ event loop
+        threading.Thread(target=_save, args=(request_id, meta, profiler), daemon=True).start()
+
+
+# ------------------------------
+# API: DANH SÁCH / TẢI PROFILE
+# ------------------------------
+@router.get("")
+def list_profiles(limit: int = 50, x_admin_key: str = Header(None)):
+    check_admin_key(x_admin_key)
+    items = []
+    paths = sorted(glob.glob(os.path.join(PROFILE_DIR, "*.json")), key=os.path.getmtime, reverse=True)
+    for path in paths[:limit]:
+        try:
+            with open(path, encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        meta.pop("top", None)
+        items.append(meta)
+    return {"profiles": items}
+
+
+@router.get("/{request_id}")
+def download_profile(request_id: str, kind: str = "folded", x_admin_key: str = Header(None)):
+    """kind=folded: collapsed stacks (speedscope/flamegraph), kind=json: thông tin + top hàm."""
+    check_admin_key(x_admin_key)
+    if kind not in ("folded", "json"):
+        raise HTTPException(status_code=400, detail="kind chỉ nhận folded hoặc json.")
+    try:
+        request_id = uuid.UUID(hex=request_id).hex  # chặn path traversal
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Không tìm thấy profile.")
+    path = os.path.join(PROFILE_DIR, f"{request_id}.{kind}")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Không tìm thấy profile.")
+    media_type = "application/json" if kind == "json" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=f"{request_id}.{kind}")
@@ -0,0 +1,91 @@
+import glob
+import os
+import re
+
+import numpy as np
+
+from .utils import decode_uploaded_file
+
+_IMAGE_EXTS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def list_images(folder):
+    paths = []
+    for ext in _IMAGE_EXTS:
+        paths += glob.glob(os.path.join(folder, ext))
+    return sorted(paths)
+
+
+def preprocess(bgr, imgsz):
+    """Letterbox + chuẩn hoá giống hệt bước tiền xử lý của ultralytics (NCHW float32, RGB, 0..1)."""
+    from ultralytics.data.augment import LetterBox
+
+    img = LetterBox(new_shape=(imgsz, imgsz), auto=False)(image=bgr)
+    img = img[:, :, ::-1].transpose(2, 0, 1)
+    return np.ascontiguousarray(img, dtype=np.float32)[None] / 255.0
+
+
+def _calibration_reader(folder, input_name, imgsz):
+    from onnxruntime.quantization import CalibrationDataReader
+
+    class ImageFolderReader(CalibrationDataReader):
+        def __init__(self):
+            self._paths = iter(list_images(folder))
+
+        def get_next(self):
+            path = next(self._paths, None)
+            if path is None:
+                return None
+            with open(path, "rb") as f:
+                return {input_name: preprocess(decode_uploaded_file(f.read()), imgsz)}
+
+    return ImageFolderReader()
+
+
+def _head_nodes_to_exclude(model):
+    """
+    Các node hậu xử lý của đầu Detect (DFL, sigmoid, ghép box) rất nhạy với lượng tử hoá;
+    giữ chúng ở FP32, chỉ lượng tử hoá Conv của đầu.
+    """
+    idx = []
+    for n in model.graph.node:
+        m = re.match(r"/model\.(\d+)/", n.name)
+        if m:
+            idx.append(int(m.group(1)))
+    if not idx:
+        return []
+    head = f"/model.{max(idx)}/"
+    return [n.name for n in model.graph.node if n.name.startswith(head) and n.op_type != "Conv"]
+
+
+def quantize_onnx(fp32_path, int8_path, calib_dir, imgsz=640):
+    """
+    Lượng tử hoá tĩnh (QDQ, weight INT8 theo kênh, activation UINT8) một model ONNX FP32,
+    hiệu chỉnh (calibrate) trên các ảnh trong `calib_dir`.
+    """
+    import onnx
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if not list_images(calib_dir):
+        raise RuntimeError(f"Không có ảnh hiệu chỉnh trong {calib_dir}")
+
+    prep_path = os.path.splitext(int8_path)[0] + ".prep.onnx"
+    quant_pre_process(fp32_path, prep_path)
+    try:
+        prep = onnx.load(prep_path)
+        input_name = prep.graph.input[0].name
+        quantize_static(
+            prep_path,
+            int8_path,
+            _calibration_reader(calib_dir, input_name, imgsz),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+            nodes_to_exclude=_head_nodes_to_exclude(prep),
+        )
+    finally:
+        if os.path.exists(prep_path):
+            os.remove(prep_path)
+    return int8_path
@@ -0,0 +1,315 @@
+import hashlib
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+
+import numpy as np
+
+from .batcher import MicroBatcher
+from .metrics import BATCH_SIZE, DETECTIONS, FORWARD_SECONDS
+from .model_loader import load_model, model_version
+from .worker_pool import WorkerPool
+
+
+class ModelNotFound(LookupError):
+    pass
+
+
+def parse_pairs(text, cast=str):
+    """Chuỗi cấu hình "a=x,b=y" → {"a": cast("x"), "b": cast("y")}, giữ thứ tự khai báo."""
+    out = {}
+    for part in (text or "").split(","):
+        if not part.strip():
+            continue
+        name, sep, value = part.partition("=")
+        if not sep or not name.strip() or not value.strip():
+            raise ValueError(f"Cấu hình không hợp lệ: '{part}' (cần dạng tên=giá_trị)")
+        out[name.strip()] = cast(value.strip())
+    return out
+
+
+def resolve_weights(path, root_dir):
+    return path if os.path.isabs(path) else os.path.join(root_dir, path)
+
+
+class ModelEntry:
+    """
+    Một phiên bản model có tên trong registry, với micro-batcher và thống kê riêng.
+
+    Model (hoặc pool worker) + lock được giữ trong một tuple `_backend` và được thay
+    nguyên khối khi hot-swap: batch đang chạy vẫn dùng bản cũ đến hết, batch sau dùng bản mới.
+    """
+
+    def __init__(self, name, weights, runtime, weight, run, batch_size, wait_ms, workers=0, cores=0):
+        self.name = name
+        self.weights = weights
+        self.runtime = runtime
+        self.weight = float(weight)
+        self.version = model_version(weights, runtime)
+        self.workers = workers
+        self.cores = cores
+        self.ready = threading.Event()
+        self.error = None
+        self.loading = False
+        self.load_seconds = None
+        self.loaded_at = None
+        self._backend = None  # (model, worker_pool, lock)
+        self.batcher = MicroBatcher(
+            self.predict_many, batch_size, wait_ms, run=run, max_concurrency=workers or 1,
+        )
+
+        self._stats_lock = threading.Lock()
+        self._requests = 0
+        self._images = 0
+        self._batches = 0
+        self._detections = Counter()
+        self._latencies = deque(maxlen=2048)
+        self._forward_per_image = deque(maxlen=2048)
+
+    # ------------------------------
+    # Nạp / hot-swap
+    # ------------------------------
+    def load(self, weights=None):
+        """Nạp (hoặc nạp lại) model; chỉ thay bản đang phục vụ khi bản mới đã nạp + warm-up xong."""
+        weights = weights or self.weights
+        self.loading = True
+        started = time.time()
+        try:
+            if self.workers > 0:
+                backend = (None, WorkerPool(self.workers, self.cores, weights=weights), None)
+            else:
+                backend = (load_model(self.runtime, weights), None, threading.Lock())
+        except Exception as e:
+            # Bản cũ (nếu có) vẫn tiếp tục phục vụ
+            self.error = str(e)
+            self.loading = False
+            print(f"❌ Lỗi nạp model {self.name}:", e)
+            return False
+
+        old, self._backend = self._backend, backend
+        self.weights = weights
+        self.version = model_version(weights, self.runtime)
+        self.error = None
+        self.loaded_at = time.time()
+        self.load_seconds = round(self.loaded_at - started, 2)
+        self.ready.set()
+        self.loading = False
+        print(f"✅ Model {self.name} ({os.path.basename(weights)}) đã sẵn sàng.")
+        if old is not None and old[1] is not None:
+            self._retire(old[1])
+        return True
+
+    @staticmethod
+    def _retire(worker_pool, timeout=120):
+        # Chờ các batch đang chạy trên pool cũ xong rồi mới tắt
+        deadline = time.time() + timeout
+        while worker_pool.stats()["inflight"] and time.time() < deadline:
+            time.sleep(0.1)
+        worker_pool.shutdown()
+
+    def shutdown(self):
+        if self._backend is not None and self._backend[1] is not None:
+            self._backend[1].shutdown()
+
+    # ------------------------------
+    # Suy luận
+    # ------------------------------
+    def predict_many(self, imgs, confs):
+        """
+        Chạy một lần forward cho cả danh sách ảnh.
+        Model chạy ở ngưỡng conf thấp nhất, sau đó lọc lại theo conf của từng ảnh.
+        """
+        model, worker_pool, lock = self._backend
+        min_conf = min(confs)
+        BATCH_SIZE.observe(len(imgs), model=self.name)
+        started = time.perf_counter()
+        if worker_pool is not None:
+            results = worker_pool.predict(imgs, min_conf)
+        else:
+            with lock:
+                results = model.predict(source=imgs, conf=min_conf, save=False, verbose=False)
+        elapsed = time.perf_counter() - started
+        FORWARD_SECONDS.observe(elapsed, model=self.name)
+
+        results = [
+            r if c <= min_conf else r[r.boxes.conf >= c]
+            for r, c in zip(results, confs)
+        ]
+        found = Counter()
+        for r in results:
+            for class_id, n in enumerate(np.bincount(r.boxes.cls.cpu().numpy().astype(np.int64)).tolist()):
+                if n:
+                    found[r.names[class_id]] += n
+        for label, n in found.items():
+            DETECTIONS.inc(n, model=self.name, label=label)
+        with self._stats_lock:
+            self._batches += 1
+            self._images += len(imgs)
+            self._detections.update(found)
+            self._forward_per_image.append(elapsed / len(imgs))
+        return results
+
+    def observe_request(self, seconds):
+        """Thời gian suy luận một request thấy được (gồm chờ gom batch)."""
+        with self._stats_lock:
+            self._requests += 1
+            self._latencies.append(seconds)
+
+    # ------------------------------
+    # Thống kê
+    # ------------------------------
+    @staticmethod
+    def _summary(values):
+        if not values:
+            return None
+        arr = np.asarray(values) * 1000
+        return {
+            "avg": round(float(arr.mean()), 2),
+            "p50": round(float(np.percentile(arr, 50)), 2),
+            "p95": round(float(np.percentile(arr, 95)), 2),
+        }
+
+    def stats(self):
+        with self._stats_lock:
+            latencies = list(self._latencies)
+            forward = list(self._forward_per_image)
+            detections = dict(self._detections)
+            requests, images, batches = self._requests, self._images, self._batches
+        return {
+            "name": self.name,
+            "weights": os.path.basename(self.weights),
+            "runtime": self.runtime,
+            "version": self.version,
+            "ready": self.ready.is_set(),
+            "loading": self.loading,
+            "error": self.error,
+            "routing_weight": self.weight,
+            "load_seconds": self.load_seconds,
+            "requests": requests,
+            "images": images,
+            "batches": batches,
+            "detections": detections,
+            "detections_per_image": round(sum(detections.values()) / images, 3) if images else None,
+            "request_latency_ms": self._summary(latencies),
+            "forward_ms_per_image": self._summary(forward),
+            "batcher": self.batcher.stats(),
+            "workers": self._backend[1].stats() if self._backend and self._backend[1] else None,
+        }
+
+
+class ModelRegistry:
+    """
+    Các model có tên cùng phục vụ trong một tiến trình.
+
+    Mỗi request chọn model theo tên (`?model=`), hoặc được chia theo trọng số A/B
+    giữa các model đã sẵn sàng; có `route_key` (ví dụ username) thì cùng một key
+    luôn rơi vào cùng một model.
+    """
+
+    def __init__(self, specs, default, routing, runtime, run, batch_size, wait_ms, workers=0, cores=0):
+        if not specs:
+            raise ValueError("Registry cần ít nhất một model.")
+        self.default = default or next(iter(specs))
+        if self.default not in specs:
+            raise ValueError(f"DEFAULT_MODEL '{self.default}' không có trong MODEL_REGISTRY.")
+        unknown = set(routing) - set(specs)
+        if unknown:
+            raise ValueError(f"MODEL_ROUTING có model không tồn tại: {', '.join(sorted(unknown))}")
+        self._factory = dict(runtime=runtime, run=run, batch_size=batch_size, wait_ms=wait_ms,
+                             workers=workers, cores=cores)
+        self._lock = threading.Lock()
+        self._entries = {}
+        for name, weights in specs.items():
+            weight = routing.get(name, 0.0) if routing else (1.0 if name == self.default else 0.0)
+            self._entries[name] = ModelEntry(name, weights, weight=weight, **self._factory)
+
+    def __iter__(self):
+        return iter(list(self._entries.values()))
+
+    def names(self):
+        return list(self._entries)
+
+    def get(self, name):
+        entry = self._entries.get(name)
+        if entry is None:
+            raise ModelNotFound(name)
+        return entry
+
+    @property
+    def default_entry(self):
+        return self._entries[self.default]
+
+    # ------------------------------
+    # Chọn model
+    # ------------------------------
+    def route(self, requested=None, route_key=None):
+        if requested:
+            return self.get(requested)
+        candidates = [e for e in self if e.weight > 0 and e.ready.is_set()]
+        if not candidates:
+            return self.default_entry
+        total = sum(e.weight for e in candidates)
+        if route_key:
+            point = int(hashlib.sha1(route_key.encode()).hexdigest()[:8], 16) / 0x100000000
+        else:
+            point = random.random()
+        point *= total
+        for e in candidates:
+            point -= e.weight
+            if point < 0:
+                return e
+        return candidates[-1]
+
+    def set_routing(self, weights):
+        unknown = set(weights) - set(self._entries)
+        if unknown:
+            raise ModelNotFound(", ".join(sorted(unknown)))
+        if any(w < 0 for w in weights.values()):
+            raise ValueError("Trọng số phải >= 0.")
+        for e in self:
+            e.weight = float(weights.get(e.name, 0.0))
+        return {e.name: e.weight for e in self}
+
+    # ------------------------------
+    # Nạp / hot-swap
+    # ------------------------------
+    def start_loading(self):
+        """Nạp lần lượt các model ở luồng nền, model mặc định trước."""
+        order = [self.default_entry] + [e for e in self if e.name != self.default]
+
+        def _load_all():
+            for e in order:
+                e.load()
+
+        threading.Thread(target=_load_all, name="model-loader", daemon=True).start()
+
+    def reload(self, name, weights=None):
+        """
+        Nạp lại (hoặc thêm mới khi có `weights`) model `name` ở luồng nền, không dừng phục vụ.
+        Trả về entry; ném RuntimeError nếu model đang được nạp.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                if not weights:
+                    raise ModelNotFound(name)
+                entry = ModelEntry(name, weights, weight=0.0, **self._factory)
+                self._entries[name] = entry
+            if entry.loading:
+                raise RuntimeError(f"Model {name} đang được nạp.")
+            entry.loading = True
+        threading.Thread(target=entry.load, args=(weights,), name=f"model-reload-{name}", daemon=True).start()
+        return entry
+
+    def shutdown(self):
+        for e in self:
+            e.shutdown()
+
+    def stats(self):
+        return {
+            "default": self.default,
+            "routing": {e.name: e.weight for e in self},
+            "models": [e.stats() for e in self],
+        }
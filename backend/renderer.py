@@ -0,0 +1,119 @@
+"""
+Vẽ box + nhãn bằng cv2 trực tiếp lên mảng BGR, dùng chung cho backend (/predict, /predict/ws)
+và trang Video/Webcam của frontend (chỉ phụ thuộc cv2 + numpy).
+
+So với `Results.plot()` của ultralytics: không chép ảnh, không đi qua PIL, ô nhãn
+(nền màu + chữ) được vẽ sẵn rồi dán lại bằng slicing numpy: tên lớp và phần độ tin cậy
+(" 0.87", chỉ 101 giá trị) là hai ô riêng đặt cạnh nhau, nên cache có giới hạn dù conf thay đổi liên tục.
+Có thể thu nhỏ ảnh trước khi vẽ (`max_dim`) để vừa nhanh hơn vừa nhẹ hơn khi mã hoá.
+"""
+import cv2
+import numpy as np
+
+# Đổi khi cách vẽ thay đổi để cache kết quả không trả ảnh annotate cũ
+RENDERER_VERSION = 2
+
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+
+# Bảng màu giống ultralytics (hex RGB) → BGR cho cv2
+_PALETTE_HEX = (
+    "FF3838", "FF9D97", "FF701F", "FFB21D", "CFD231", "48F90A", "92CC17", "3DDB86", "1A9334", "00D4BB",
+    "2C99A8", "00C2FF", "344593", "6473FF", "0018EC", "8438FF", "520085", "CB38FF", "FF95C8", "FF37C7",
+)
+PALETTE = [(int(h[4:6], 16), int(h[2:4], 16), int(h[0:2], 16)) for h in _PALETTE_HEX]
+
+_GLYPH_CACHE_MAX = 2048
+_glyphs = {}
+
+
+def class_color(class_id):
+    return PALETTE[int(class_id) % len(PALETTE)]
+
+
+def _line_width(h, w):
+    return max(round((h + w) / 2 * 0.003), 2)
+
+
+def _glyph(text, color, line_width, pad_left=True, pad_right=True):
+    """
+    Ô chữ (nền màu lớp + chữ) đã vẽ sẵn; khoá theo chuỗi, màu, nét vẽ và lề.
+    Chiều cao chỉ phụ thuộc nét vẽ nên các ô ghép cạnh nhau luôn thẳng hàng.
+    """
+    key = (text, color, line_width, pad_left, pad_right)
+    patch = _glyphs.get(key)
+    if patch is None:
+        scale = line_width / 3
+        thickness = max(line_width - 1, 1)
+        tw = cv2.getTextSize(text, _FONT, scale, thickness)[0][0]
+        (_, th), baseline = cv2.getTextSize("Ag0", _FONT, scale, thickness)
+        pad = max(line_width, 2)
+        left = pad if pad_left else 0
+        patch = np.empty((th + baseline + pad, tw + left + (pad if pad_right else 0), 3), dtype=np.uint8)
+        patch[:] = color
+        # Chữ đen trên nền sáng, chữ trắng trên nền tối
+        text_color = (0, 0, 0) if sum(color) > 382 else (255, 255, 255)
+        cv2.putText(patch, text, (left, th + pad // 2), _FONT, scale, text_color, thickness, cv2.LINE_AA)
+        if len(_glyphs) >= _GLYPH_CACHE_MAX:
+            _glyphs.clear()
+        _glyphs[key] = patch
+    return patch
+
+
+def _blit(img, patch, x, y):
+    """Dán `patch` vào img tại góc trên-trái (x, y), cắt phần nằm ngoài ảnh."""
+    h, w = img.shape[:2]
+    ph, pw = patch.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + pw, w), min(y + ph, h)
+    if x1 > x0 and y1 > y0:
+        img[y0:y1, x0:x1] = patch[y0 - y:y1 - y, x0 - x:x1 - x]
+
+
+def draw_detections(img, xyxy, class_ids, confs, names, max_dim=0, copy=False, show_conf=True):
+    """
+    Vẽ box lên ảnh BGR `img` và trả về ảnh đã vẽ.
+
+    xyxy: (N, 4) toạ độ theo ảnh `img`; class_ids, confs: (N,).
+    max_dim > 0: thu nhỏ ảnh sao cho cạnh dài <= max_dim rồi mới vẽ (toạ độ được scale theo).
+    Mặc định vẽ thẳng vào `img` (không chép) khi không thu nhỏ; `copy=True` để giữ ảnh gốc.
+    """
+    xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+    h, w = img.shape[:2]
+    if max_dim and max(h, w) > max_dim:
+        ratio = max_dim / max(h, w)
+        img = cv2.resize(img, (round(w * ratio), round(h * ratio)), interpolation=cv2.INTER_AREA)
+        xyxy = xyxy * ratio
+        h, w = img.shape[:2]
+    elif copy:
+        img = img.copy()
+
+    lw = _line_width(h, w)
+    boxes = np.rint(xyxy).astype(np.int32).tolist()
+    class_ids = np.asarray(class_ids).astype(np.int64).tolist()
+    confs = np.asarray(confs, dtype=np.float32).tolist()
+    for (x1, y1, x2, y2), c, p in zip(boxes, class_ids, confs):
+        color = class_color(c)
+        cv2.rectangle(img, (x1, y1), (x2, y2), color, lw, cv2.LINE_AA)
+        label = names.get(c, str(c)) if isinstance(names, dict) else names[c]
+        patch = _glyph(label, color, lw, pad_right=not show_conf)
+        # Nhãn đặt trên box; sát mép trên ảnh thì đặt vào trong box
+        ty = y1 - patch.shape[0] if y1 - patch.shape[0] >= 0 else y1
+        tx = x1 - lw // 2
+        _blit(img, patch, tx, ty)
+        if show_conf:
+            _blit(img, _glyph(f" {p:.2f}", color, lw, pad_left=False), tx + patch.shape[1], ty)
+    return img
+
+
+def render_result(result, max_dim=0, copy=False):
+    """Vẽ một `Results` của ultralytics (dùng orig_img + boxes), thay cho `result.plot()`."""
+    boxes = result.boxes
+    return draw_detections(
+        result.orig_img,
+        boxes.xyxy.cpu().numpy(),
+        boxes.cls.cpu().numpy(),
+        boxes.conf.cpu().numpy(),
+        result.names,
+        max_dim=max_dim,
+        copy=copy,
+    )
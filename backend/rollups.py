@@ -0,0 +1,159 @@
+"""
+Bảng tổng hợp theo ngày (daily_rollups) cho thống kê và bộ đếm tài khoản.
+
+Mỗi bản ghi là một (username, day, source) với:
+  logs        – số lần ghi log (số lần phân tích / lượt chat / báo cáo)
+  detections  – tổng số trái phát hiện
+  counts      – số trái theo lớp, vd {"mit_chin": 12, "mit_non": 3}
+`day` là thời điểm 0h của ngày theo STATS_TIMEZONE (lưu dạng UTC); source là
+image | video | webcam | chat | compare.
+
+Frontend `$inc` bản ghi tương ứng mỗi khi ghi một log (frontend/utils/db.py), nên dashboard
+chỉ đọc O(số ngày) bản ghi. Lệnh rebuild tính lại từ log gốc (backfill / sửa lệch), verify so sánh:
+
+    python -m backend.rollups rebuild [--username nam]
+    python -m backend.rollups verify [--username nam]
+"""
+import argparse
+import re
+import sys
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from .config import STATS_TIMEZONE
+from .mongodb_connection import connect, get_logs_database
+
+ROLLUP_COLLECTION = "daily_rollups"
+ROLLUP_KEY = ("username", "day", "source")
+
+# collection log → source (biểu thức aggregation)
+SOURCES = {
+    "analysis_logs": {"$literal": "image"},
+    "video_logs": {"$ifNull": ["$source", "video"]},
+    "chat_logs": {"$literal": "chat"},
+    "compare_logs": {"$literal": "compare"},
+}
+
+_OFFSET = re.compile(r"([+-])(\d{2}):?(\d{2})?")
+
+
+def parse_tz(name):
+    """Múi giờ theo cú pháp MongoDB nhận (+0700, +07:00, +07 hoặc tên IANA) → tzinfo của Python."""
+    m = _OFFSET.fullmatch(name)
+    if m:
+        offset = timedelta(hours=int(m.group(2)), minutes=int(m.group(3) or 0))
+        return timezone(-offset if m.group(1) == "-" else offset)
+    return ZoneInfo(name)
+
+
+def day_start(dt, tz, next_day=False):
+    """
+    0h (theo `tz`) của ngày chứa `dt`, đổi sang UTC – đúng giá trị `day` của bản ghi rollup.
+    next_day=True: làm tròn lên, tức 0h của ngày kế tiếp nếu `dt` không rơi đúng 0h.
+    """
+    local = dt.astimezone(tz)
+    day = local.date()
+    if next_day and local.replace(tzinfo=None) != datetime(day.year, day.month, day.day):
+        day += timedelta(days=1)
+    return datetime(day.year, day.month, day.day, tzinfo=tz).astimezone(timezone.utc)
+
+
+def rollup_pipeline(source, match=None, tz=STATS_TIMEZONE):
+    """Gom log gốc thành bản ghi rollup (chưa ghi đi đâu)."""
+    first = {"$lte": [{"$ifNull": ["$i", 0]}, 0]}  # dòng đầu tiên của mỗi log sau $unwind
+    return [
+        {"$match": {**(match or {}), "timestamp": {"$type": "date"}}},
+        {"$project": {
+            "username": 1,
+            "source": source,
+            "day": {"$dateTrunc": {"date": "$timestamp", "unit": "day", "timezone": tz}},
+            "kv": {"$objectToArray": {"$ifNull": ["$counts", {}]}},
+        }},
+        {"$set": {"detections": {"$sum": "$kv.v"}}},
+        {"$unwind": {"path": "$kv", "includeArrayIndex": "i", "preserveNullAndEmptyArrays": True}},
+        {"$group": {
+            "_id": {"username": "$username", "day": "$day", "source": "$source", "label": "$kv.k"},
+            "count": {"$sum": {"$ifNull": ["$kv.v", 0]}},
+            "logs": {"$sum": {"$cond": [first, 1, 0]}},
+            "detections": {"$sum": {"$cond": [first, "$detections", 0]}},
+        }},
+        {"$group": {
+            "_id": {"username": "$_id.username", "day": "$_id.day", "source": "$_id.source"},
+            "logs": {"$sum": "$logs"},
+            "detections": {"$sum": "$detections"},
+            "counts": {"$push": {"k": "$_id.label", "v": "$count"}},
+        }},
+        {"$project": {
+            "_id": 0,
+            "username": "$_id.username",
+            "day": "$_id.day",
+            "source": "$_id.source",
+            "logs": 1,
+            "detections": 1,
+            "counts": {"$arrayToObject": {"$filter": {"input": "$counts", "cond": {"$ne": ["$$this.k", None]}}}},
+        }},
+    ]
+
+
+def rebuild(db=None, username=None):
+    """
+    Xoá rollup (của một user hoặc tất cả) rồi tính lại từ log gốc, ghi bằng $merge.
+    Log ghi trong lúc rebuild có thể bị tính lệch: chạy lúc ít tải, hoặc chạy verify sau đó.
+    """
+    db = db if db is not None else get_logs_database()
+    match = {"username": username} if username else {}
+    deleted = db[ROLLUP_COLLECTION].delete_many(match).deleted_count
+    for name, source in SOURCES.items():
+        db[name].aggregate(rollup_pipeline(source, match) + [
+            {"$set": {"updated_at": "$$NOW"}},
+            {"$merge": {"into": ROLLUP_COLLECTION, "on": list(ROLLUP_KEY),
+                        "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ])
+    rebuilt = db[ROLLUP_COLLECTION].count_documents(match)
+    print(f"✅ Đã tính lại {rebuilt} bản ghi rollup (xoá {deleted} bản ghi cũ).")
+    return rebuilt
+
+
+def verify(db=None, username=None):
+    """So sánh rollup hiện có với kết quả tính lại từ log gốc; trả về danh sách chỗ lệch."""
+    db = db if db is not None else get_logs_database()
+    match = {"username": username} if username else {}
+    expected = {}
+    for name, source in SOURCES.items():
+        for row in db[name].aggregate(rollup_pipeline(source, match)):
+            expected[tuple(row[k] for k in ROLLUP_KEY)] = row
+    actual = {
+        tuple(row[k] for k in ROLLUP_KEY): row
+        for row in db[ROLLUP_COLLECTION].find(match, {"_id": 0, "updated_at": 0})
+    }
+    diffs = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        want, got = expected.get(key), actual.get(key)
+        fields = ("logs", "detections", "counts")
+        if want is None or got is None or any((want.get(f) or 0) != (got.get(f) or 0) for f in fields):
+            diffs.append({"key": key, "expected": want, "actual": got})
+    return diffs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("rebuild", "verify"))
+    parser.add_argument("--username", default=None, help="chỉ xử lý một user")
+    args = parser.parse_args(argv)
+    connect()  # chạy tay: thử lại với backoff nếu Mongo chưa sẵn sàng
+
+    if args.command == "rebuild":
+        rebuild(username=args.username)
+        return 0
+    diffs = verify(username=args.username)
+    for d in diffs[:20]:
+        print(f"❌ {d['key']}: rollup={d['actual']} / log gốc={d['expected']}")
+    if diffs:
+        print(f"{len(diffs)} bản ghi rollup bị lệch. Chạy `python -m backend.rollups rebuild` để tính lại.")
+        return 1
+    print("✅ Rollup khớp với log gốc.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
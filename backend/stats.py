@@ -0,0 +1,161 @@
+"""
+Thống kê vườn cho trang Thống kê: tính bằng aggregation pipeline phía MongoDB.
+
+Bucket ngày/tuần đọc từ daily_rollups (O(số ngày), xem backend/rollups.py); bucket giờ
+gom trực tiếp từ analysis_logs. Rollup chỉ có độ phân giải ngày nên [start, end) được mở
+rộng ra trọn ngày (theo STATS_TIMEZONE); khoảng thực sự được tính nằm ở effective_start /
+effective_end. Chỉ các trường cần dùng đi qua pipeline; mảng `raw` của từng log không bao
+giờ rời khỏi database, nên phản hồi chỉ vài KB dù user có nhiều năm lịch sử.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+from pymongo import DESCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+
+from .config import STATS_DEFAULT_DAYS, STATS_MAX_BUCKETS, STATS_TIMEZONE
+from .mongodb_connection import get_logs_database
+from .rollups import ROLLUP_COLLECTION, day_start, parse_tz
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400}
+
+
+def _to_utc(dt):
+    # Thời điểm không có múi giờ được hiểu là giờ của máy chủ
+    return dt.astimezone(timezone.utc)
+
+
+def _counts_kv(field="$counts"):
+    return {"$objectToArray": {"$ifNull": [field, {}]}}
+
+
+def _facets(time_field, count_expr, bucket, tz):
+    trend_time = f"${time_field}"
+    if not (time_field == "day" and bucket == "day"):
+        trend_time = {"$dateTrunc": {"date": trend_time, "unit": bucket, "timezone": tz, "startOfWeek": "monday"}}
+    return {"$facet": {
+        "summary": [
+            {"$group": {"_id": None, "analyses": {"$sum": count_expr},
+                        "first": {"$min": f"${time_field}"}, "last": {"$max": f"${time_field}"}}},
+        ],
+        "totals": [
+            {"$project": {"kv": _counts_kv()}},
+            {"$unwind": "$kv"},
+            {"$group": {"_id": "$kv.k", "count": {"$sum": "$kv.v"}}},
+            {"$sort": {"_id": 1}},
+        ],
+        "trend": [
+            {"$project": {"time": trend_time, "kv": _counts_kv()}},
+            {"$unwind": "$kv"},
+            {"$group": {"_id": {"time": "$time", "label": "$kv.k"}, "count": {"$sum": "$kv.v"}}},
+            {"$group": {"_id": "$_id.time", "counts": {"$push": {"k": "$_id.label", "v": "$count"}},
+                        "total": {"$sum": "$count"}}},
+            {"$sort": {"_id": 1}},
+            {"$project": {"_id": 0, "time": "$_id", "counts": {"$arrayToObject": "$counts"}, "total": 1}},
+        ],
+    }}
+
+
+def build_pipeline(username, start, end, bucket, tz):
+    """Từ analysis_logs: match (index username+timestamp) → project → $facet: tổng theo lớp, xu hướng theo bucket."""
+    return [
+        {"$match": {"username": username, "timestamp": {"$gte": start, "$lt": end}}},
+        {"$project": {"_id": 0, "timestamp": 1, "counts": 1}},
+        _facets("timestamp", 1, bucket, tz),
+    ]
+
+
+def build_rollup_pipeline(username, start, end, bucket, tz):
+    """Từ daily_rollups: các ngày trong [start, end), hai mốc đã là 0h (index username+day+source)."""
+    return [
+        {"$match": {"username": username, "day": {"$gte": start, "$lt": end}, "source": "image"}},
+        {"$project": {"_id": 0, "day": 1, "counts": 1, "logs": 1}},
+        _facets("day", "$logs", bucket, tz),
+    ]
+
+
+def _as_utc(dt):
+    # pymongo (không bật tz_aware) trả datetime UTC không có múi giờ
+    return dt.replace(tzinfo=timezone.utc) if dt is not None and dt.tzinfo is None else dt
+
+
+# ------------------------------
+# API: THỐNG KÊ VƯỜN
+# ------------------------------
+@router.get("")
+def garden_stats(
+    username: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    bucket: str = Query("day", description="hour | day | week"),
+    tz: str = Query(STATS_TIMEZONE, description="múi giờ chia bucket, vd Asia/Ho_Chi_Minh hoặc +07:00"),
+):
+    if bucket not in BUCKET_SECONDS:
+        raise HTTPException(status_code=400, detail="bucket chỉ nhận hour, day hoặc week.")
+    end = _to_utc(end) if end else datetime.now(timezone.utc)
+    start = _to_utc(start) if start else end - timedelta(days=STATS_DEFAULT_DAYS)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start phải trước end.")
+    if (end - start).total_seconds() / BUCKET_SECONDS[bucket] > STATS_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Khoảng thời gian quá dài cho bucket={bucket} (tối đa {STATS_MAX_BUCKETS} bucket), hãy chọn bucket lớn hơn.",
+        )
+
+    try:
+        db = get_logs_database()
+        # Rollup được chia ngày theo STATS_TIMEZONE: múi giờ khác hoặc bucket giờ thì gom từ log gốc
+        if bucket == "hour" or tz != STATS_TIMEZONE:
+            computed_from = "analysis_logs"
+            effective_start, effective_end = start, end
+            facets = next(db[computed_from].aggregate(build_pipeline(username, start, end, bucket, tz)))
+        else:
+            # Rollup không tách được một phần ngày: mở rộng ra trọn các ngày giao với [start, end)
+            computed_from = ROLLUP_COLLECTION
+            day_tz = parse_tz(tz)
+            effective_start, effective_end = day_start(start, day_tz), day_start(end, day_tz, next_day=True)
+            facets = next(db[computed_from].aggregate(
+                build_rollup_pipeline(username, effective_start, effective_end, bucket, tz)
+            ))
+        # Ảnh chụp mới nhất cho các thẻ tổng quan: không giới hạn theo khoảng đã chọn
+        latest = db["analysis_logs"].find_one(
+            {"username": username},
+            {"_id": 0, "timestamp": 1, "counts": 1},
+            sort=[("timestamp", DESCENDING)],
+        )
+    except OperationFailure as e:
+        raise HTTPException(status_code=400, detail=f"Truy vấn thống kê không hợp lệ: {e}")
+    except PyMongoError:
+        raise HTTPException(status_code=503, detail="Không kết nối được cơ sở dữ liệu, vui lòng thử lại sau.")
+
+    summary = facets["summary"][0] if facets["summary"] else {"analyses": 0, "first": None, "last": None}
+    totals = {row["_id"]: row["count"] for row in facets["totals"]}
+    if latest:
+        latest = {
+            "timestamp": _as_utc(latest["timestamp"]),
+            "counts": latest.get("counts") or {},
+            "total": sum((latest.get("counts") or {}).values()),
+        }
+    return {
+        "username": username,
+        "start": start,
+        "end": end,
+        # Khoảng summary/totals/trend thực sự bao phủ (bucket ngày/tuần: tròn ngày theo STATS_TIMEZONE)
+        "effective_start": effective_start,
+        "effective_end": effective_end,
+        "bucket": bucket,
+        "timezone": tz,
+        "computed_from": computed_from,
+        "summary": {
+            "analyses": summary["analyses"],
+            "detections": sum(totals.values()),
+            "first": _as_utc(summary["first"]),
+            "last": _as_utc(summary["last"]),
+        },
+        "totals": totals,
+        "latest": latest,
+        "trend": [{**row, "time": _as_utc(row["time"])} for row in facets["trend"]],
+    }
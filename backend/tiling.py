@@ -0,0 +1,86 @@
+import numpy as np
+import torch
+from torchvision.ops import batched_nms
+from ultralytics.engine.results import Results
+
+
+def _starts(length, tile, stride):
+    """Vị trí bắt đầu các ô theo một trục; ô cuối luôn khít mép ảnh."""
+    if length <= tile:
+        return np.array([0])
+    starts = np.arange(0, length - tile + 1, stride)
+    if starts[-1] != length - tile:
+        starts = np.append(starts, length - tile)
+    return starts
+
+
+class TooManyTiles(ValueError):
+    """Ảnh + tham số chia ô cho ra nhiều ô hơn giới hạn (TILE_MAX_COUNT)."""
+
+    def __init__(self, count, limit):
+        super().__init__(f"{count} ô > giới hạn {limit}")
+        self.count = count
+        self.limit = limit
+
+
+def _grid(h, w, tile_size, overlap):
+    stride = max(1, int(tile_size * (1 - overlap)))
+    return _starts(max(h, tile_size), tile_size, stride), _starts(max(w, tile_size), tile_size, stride)
+
+
+def count_tiles(h, w, tile_size, overlap):
+    """Số ô make_tiles sẽ tạo cho ảnh h×w – tính trước, không cấp phát gì."""
+    ys, xs = _grid(h, w, tile_size, overlap)
+    return len(ys) * len(xs)
+
+
+def make_tiles(img, tile_size, overlap, max_tiles=0):
+    """
+    Cắt ảnh BGR thành các ô vuông `tile_size` chồng lấn `overlap` (0..0.5).
+
+    Không lặp từng ô: dùng sliding_window_view (view, không chép) rồi lấy các ô cần thiết
+    bằng một lần fancy-index, ra mảng (n, tile, tile, 3) liền mạch để đưa vào model một lượt.
+    Trả về (tiles, offsets) với offsets[i] = (x0, y0) của ô i trong ảnh gốc.
+    Ném TooManyTiles trước khi chép dữ liệu nếu số ô vượt `max_tiles` (0 = không giới hạn).
+    """
+    h, w = img.shape[:2]
+    ys, xs = _grid(h, w, tile_size, overlap)
+    if max_tiles and len(ys) * len(xs) > max_tiles:
+        raise TooManyTiles(len(ys) * len(xs), max_tiles)
+    if h < tile_size or w < tile_size:
+        # Ảnh nhỏ hơn ô ở một chiều: đệm (viền đen) cho đủ một ô
+        img = np.pad(img, ((0, max(0, tile_size - h)), (0, max(0, tile_size - w)), (0, 0)))
+
+    windows = np.lib.stride_tricks.sliding_window_view(img, (tile_size, tile_size, 3))[:, :, 0]
+    tiles = windows[np.ix_(ys, xs)].reshape(-1, tile_size, tile_size, 3)
+    gy, gx = np.meshgrid(ys, xs, indexing="ij")
+    offsets = np.stack([gx.ravel(), gy.ravel()], axis=1)
+    return tiles, offsets
+
+
+def merge_tile_results(results, offsets, orig_img, iou=0.5):
+    """
+    Gộp kết quả của các ô về toạ độ ảnh gốc và chạy NMS theo lớp trên toàn ảnh
+    để bỏ box trùng ở vùng chồng lấn. Trả về một `Results` như khi chạy trên ảnh gốc.
+    """
+    names = results[0].names
+    h, w = orig_img.shape[:2]
+    parts = []
+    for r, (x0, y0) in zip(results, offsets.tolist()):
+        data = r.boxes.data
+        if not len(data):
+            continue
+        data = data.clone()
+        data[:, [0, 2]] += x0
+        data[:, [1, 3]] += y0
+        parts.append(data)
+
+    if parts:
+        boxes = torch.cat(parts)
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clamp(0, w)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clamp(0, h)
+        keep = batched_nms(boxes[:, :4], boxes[:, 4], boxes[:, 5].long(), iou)
+        boxes = boxes[keep]
+    else:
+        boxes = torch.zeros((0, 6))
+    return Results(orig_img=orig_img, path="", names=names, boxes=boxes)
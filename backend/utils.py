@@ -1,11 +1,100 @@
-import base64  
-import io  
-from PIL import Image  
-
-def encode_image_to_base64(img: Image.Image) -> str:  
-    buf = io.BytesIO()  
-    img.save(buf, format="JPEG")  
-    return base64.b64encode(buf.getvalue()).decode()  
-  
-def decode_uploaded_file(file_bytes: bytes) -> Image.Image:  
-    return Image.open(io.BytesIO(file_bytes)).convert("RGB")  
+import io
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+# Mã EXIF Orientation (0x0112) → phép xoay/lật tương ứng trên mảng BGR
+_EXIF_ORIENTATION = 0x0112
+_ORIENT_OPS = {
+    2: lambda a: cv2.flip(a, 1),
+    3: lambda a: cv2.rotate(a, cv2.ROTATE_180),
+    4: lambda a: cv2.flip(a, 0),
+    5: lambda a: cv2.transpose(a),
+    6: lambda a: cv2.rotate(a, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda a: cv2.flip(cv2.transpose(a), -1),
+    8: lambda a: cv2.rotate(a, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+_REDUCED_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+# Định dạng ảnh trả về → (phần mở rộng cho cv2.imencode, media type)
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", "image/jpeg"),
+    "webp": (".webp", "image/webp"),
+}
+
+def encode_bgr(arr: np.ndarray, fmt: str = "jpeg", quality: int = 75, progressive: bool = False) -> bytes:
+    ext, _ = IMAGE_FORMATS[fmt]
+    if fmt == "webp":
+        params = [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+    else:
+        params = [cv2.IMWRITE_JPEG_QUALITY, int(quality), cv2.IMWRITE_JPEG_PROGRESSIVE, int(progressive)]
+    ok, buf = cv2.imencode(ext, arr, params)
+    if not ok:
+        raise ValueError(f"Không mã hoá được ảnh {fmt.upper()}.")
+    return buf.tobytes()
+
+def encode_bgr_to_jpeg(arr: np.ndarray, quality: int = 75) -> bytes:
+    return encode_bgr(arr, "jpeg", quality)
+
+def resize_max_dim(arr: np.ndarray, max_dim: int) -> np.ndarray:
+    """Thu nhỏ (INTER_AREA) để cạnh dài <= max_dim; ảnh đã đủ nhỏ được trả nguyên."""
+    h, w = arr.shape[:2]
+    if not max_dim or max(h, w) <= max_dim:
+        return arr
+    ratio = max_dim / max(h, w)
+    return cv2.resize(arr, (max(1, round(w * ratio)), max(1, round(h * ratio))), interpolation=cv2.INTER_AREA)
+
+def encode_with_thumbnail(arr: np.ndarray, fmt: str = "jpeg", quality: int = 75,
+                          progressive: bool = False, max_dim: int = 0, thumb_dim: int = 0):
+    """
+    Mã hoá ảnh BGR theo kích thước client thực sự hiển thị, kèm thumbnail trong cùng một lượt:
+    thumbnail được thu nhỏ từ ảnh đã thu về `max_dim` (không phải từ ảnh gốc).
+    Trả về (ảnh, thumbnail hoặc None).
+    """
+    arr = resize_max_dim(arr, max_dim)
+    image = encode_bgr(arr, fmt, quality, progressive)
+    thumb = None
+    if thumb_dim:
+        thumb = encode_bgr(resize_max_dim(arr, thumb_dim), fmt, quality)
+    return image, thumb
+
+def decode_image(file_bytes: bytes, target_size: int = 0):
+    """
+    Giải mã ảnh thẳng từ bytes sang mảng BGR (định dạng YOLO dùng trực tiếp).
+
+    Với JPEG lớn hơn nhiều so với `target_size` (kích thước đầu vào model), libjpeg giải mã
+    ở 1/2, 1/4 hoặc 1/8 độ phân giải nhưng cạnh dài vẫn >= `target_size`, nên YOLO không mất
+    chi tiết mà bỏ được phần lớn công giải mã. Orientation trong EXIF được áp dụng.
+
+    Trả về (ảnh, scale) với scale = cạnh ảnh trả về / cạnh ảnh gốc.
+    """
+    header = Image.open(io.BytesIO(file_bytes))  # chỉ đọc header, chưa giải mã pixel
+    width, height = header.size
+    orientation = header.getexif().get(_EXIF_ORIENTATION, 1)
+
+    factor = 1
+    if header.format == "JPEG" and target_size > 0:
+        for f in (8, 4, 2):
+            if max(width, height) // f >= target_size:
+                factor = f
+                break
+
+    flags = _REDUCED_FLAGS.get(factor, cv2.IMREAD_COLOR) | cv2.IMREAD_IGNORE_ORIENTATION
+    img = cv2.imdecode(np.frombuffer(file_bytes, dtype=np.uint8), flags)
+    if img is None:
+        # Định dạng OpenCV không đọc được (GIF, ...) → đi đường PIL
+        rgb = ImageOps.exif_transpose(header).convert("RGB")
+        return np.ascontiguousarray(np.asarray(rgb)[:, :, ::-1]), 1.0
+
+    op = _ORIENT_OPS.get(orientation)
+    if op is not None:
+        img = op(img)
+    return img, img.shape[1] / (height if orientation in (5, 6, 7, 8) else width)
+
+def decode_uploaded_file(file_bytes: bytes) -> np.ndarray:
+    return decode_image(file_bytes)[0]
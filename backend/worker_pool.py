@@ -0,0 +1,196 @@
+import itertools
+import multiprocessing as mp
+import os
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+def _available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def _to_bgr_array(img):
+    """Ảnh PIL (RGB) → ndarray BGR như YOLO mong đợi; ndarray được coi là BGR sẵn."""
+    if isinstance(img, np.ndarray):
+        return img
+    return np.asarray(img.convert("RGB"))[:, :, ::-1]
+
+
+# ------------------------------
+# Tiến trình worker
+# ------------------------------
+def _worker_main(worker_id, cores, task_q, result_q, weights=None):
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    import torch
+    torch.set_num_threads(max(1, len(cores)))
+
+    from .model_loader import load_model
+    model = load_model(weights=weights) if weights else load_model()
+    result_q.put((None, True, worker_id))
+
+    deferred = []  # vùng nhớ chưa đóng được vì YOLO còn giữ view tới ảnh
+    while True:
+        task = task_q.get()
+        if task is None:
+            break
+
+        for shm in deferred[:]:
+            try:
+                shm.close()
+                deferred.remove(shm)
+            except BufferError:
+                pass
+
+        job_id, shm_name, specs, conf = task
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            imgs = [
+                np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+                for offset, shape, dtype in specs
+            ]
+            results = model.predict(source=imgs, conf=conf, save=False, verbose=False)
+            # Ảnh gốc đã có ở tiến trình API, không pickle ngược lại
+            for r in results:
+                r.orig_img = None
+            result_q.put((job_id, True, results))
+        except Exception as e:
+            result_q.put((job_id, False, f"{type(e).__name__}: {e}"))
+        finally:
+            imgs = results = None
+            try:
+                shm.close()
+            except BufferError:
+                deferred.append(shm)
+
+
+# ------------------------------
+# Pool phía tiến trình API
+# ------------------------------
+class WorkerPool:
+    """
+    N tiến trình worker, mỗi tiến trình giữ một bản YOLO riêng và được ghim vào
+    một nhóm core riêng (tránh GIL và tranh chấp luồng torch).
+
+    Ảnh đã giải mã được chép một lần vào shared memory; worker đọc trực tiếp từ đó,
+    chỉ kết quả (box, không kèm ảnh) được pickle ngược lại.
+    """
+
+    def __init__(self, num_workers, cores_per_worker=0, start_timeout=300, job_timeout=120, weights=None):
+        self.num_workers = max(1, int(num_workers))
+        self.job_timeout = job_timeout
+
+        cores = _available_cores()
+        per = int(cores_per_worker) or max(1, len(cores) // self.num_workers)
+        self.core_slices = [
+            cores[i * per:(i + 1) * per] or [cores[i % len(cores)]]
+            for i in range(self.num_workers)
+        ]
+
+        ctx = mp.get_context("spawn")
+        self._task_q = ctx.Queue()
+        self._result_q = ctx.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = threading.Semaphore(0)
+        self._jobs_done = 0
+        self._images_done = 0
+
+        self._procs = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, self.core_slices[i], self._task_q, self._result_q, weights),
+                daemon=True,
+            )
+            for i in range(self.num_workers)
+        ]
+        for p in self._procs:
+            p.start()
+
+        self._collector = threading.Thread(target=self._collect, name="worker-pool-collector", daemon=True)
+        self._collector.start()
+
+        for _ in range(self.num_workers):
+            if not self._ready.acquire(timeout=start_timeout):
+                self.shutdown()
+                raise RuntimeError("Worker suy luận không khởi động kịp.")
+        print(f"✅ Đã khởi động {self.num_workers} worker suy luận, core: {self.core_slices}")
+
+    def _collect(self):
+        while True:
+            msg = self._result_q.get()
+            if msg is None:
+                break
+            job_id, ok, payload = msg
+            if job_id is None:
+                self._ready.release()
+                continue
+            with self._lock:
+                future = self._pending.pop(job_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def predict(self, imgs, conf):
+        """Hàm đồng bộ: chạy một batch trên worker rảnh đầu tiên, trả về list Results."""
+        arrays = [_to_bgr_array(img) for img in imgs]
+        total = sum(a.nbytes for a in arrays)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, total))
+        try:
+            specs, offset = [], 0
+            for a in arrays:
+                dst = np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf, offset=offset)
+                dst[...] = a
+                del dst
+                specs.append((offset, a.shape, a.dtype.str))
+                offset += a.nbytes
+
+            job_id = next(self._ids)
+            future = Future()
+            with self._lock:
+                self._pending[job_id] = future
+            self._task_q.put((job_id, shm.name, specs, conf))
+            try:
+                results = future.result(timeout=self.job_timeout)
+            finally:
+                with self._lock:
+                    self._pending.pop(job_id, None)
+        finally:
+            shm.close()
+            shm.unlink()
+
+        for r, a in zip(results, arrays):
+            r.orig_img = a
+        with self._lock:
+            self._jobs_done += 1
+            self._images_done += len(arrays)
+        return results
+
+    def stats(self):
+        return {
+            "workers": self.num_workers,
+            "core_slices": self.core_slices,
+            "alive": sum(p.is_alive() for p in self._procs),
+            "inflight": len(self._pending),
+            "batches": self._jobs_done,
+            "images": self._images_done,
+        }
+
+    def shutdown(self):
+        for _ in self._procs:
+            self._task_q.put(None)
+        for p in self._procs:
+            p.join(timeout=5)
+            if p.is_alive():
+                p.terminate()
+        self._result_q.put(None)
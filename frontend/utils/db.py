@@ -0,0 +1,239 @@
+"""
+Tầng truy cập MongoDB dùng chung cho mọi trang Streamlit.
+
+Streamlit chạy lại script của trang ở mỗi lần tương tác; nếu mỗi lần đều tạo
+MongoClient mới thì mỗi lần lại mở một pool kết nối + dò server (server discovery).
+Module này giữ một MongoClient duy nhất cho cả tiến trình (client của pymongo an toàn
+khi dùng từ nhiều luồng/phiên), và các trang chỉ gọi các hàm repository bên dưới.
+"""
+import os
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, TypedDict
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+from pymongo import DESCENDING, MongoClient
+
+load_dotenv()
+
+MONGO_URI = os.getenv("MONGO_URI")
+LOGS_DB = os.getenv("MONGO_LOGS_DB", "mit_detection")
+USERS_DB = os.getenv("MONGO_USERS_DB", "nam_db")  # database của backend (backend/mongodb_connection.py)
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "20"))
+MONGO_TIMEOUT_MS = int(os.getenv("MONGO_TIMEOUT_MS", "3000"))
+
+# `timestamp` được lưu dạng BSON date (UTC); khi đọc ra được đổi sẵn sang giờ địa phương để hiển thị
+LOCAL_TZ = datetime.now().astimezone().tzinfo
+LOG_COLLECTIONS = ("analysis_logs", "video_logs", "chat_logs", "compare_logs")
+# Tổng hợp theo (username, ngày, nguồn), xem backend/rollups.py. Ngày được chia theo cùng biến
+# STATS_TIMEZONE với backend (trống = múi giờ máy đang chạy), để $inc và rebuild rơi vào cùng một `day`.
+ROLLUP_COLLECTION = "daily_rollups"
+STATS_TIMEZONE = os.getenv("STATS_TIMEZONE", "")
+
+_client = None
+_lock = threading.Lock()
+
+
+# ==================== KIỂU DỮ LIỆU ====================
+class AnalysisLog(TypedDict, total=False):
+    timestamp: datetime
+    username: str
+    counts: Dict[str, int]
+    total: int
+    confidence: float
+    file_name: str
+    raw: List[dict]
+
+
+class VideoLog(TypedDict, total=False):
+    timestamp: datetime
+    username: str
+    video_name: str
+    counts: Dict[str, int]
+    total: int
+    confidence: float
+    source: str  # video | webcam
+    raw: dict
+
+
+class ChatLog(TypedDict, total=False):
+    timestamp: datetime
+    username: str
+    user_message: str
+    assistant_reply: str
+    model: str
+
+
+class CompareLog(TypedDict, total=False):
+    timestamp: datetime
+    username: str
+    src_n: str
+    src_s: str
+    insights: List[str]
+
+
+# ==================== KẾT NỐI ====================
+def get_client() -> MongoClient:
+    """MongoClient dùng chung cho cả tiến trình, tạo ở lần gọi đầu tiên."""
+    global _client
+    if _client is not None:
+        return _client
+    with _lock:
+        if _client is None:
+            _client = MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=0,
+                maxIdleTimeMS=60_000,
+                serverSelectionTimeoutMS=MONGO_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_TIMEOUT_MS,
+                socketTimeoutMS=10_000,
+                appname="agrivision-frontend",
+                tz_aware=True,
+                tzinfo=LOCAL_TZ,
+            )
+    return _client
+
+
+def logs_db():
+    return get_client()[LOGS_DB]
+
+
+def utcnow() -> datetime:
+    """Giá trị cho trường `timestamp` của log (lưu thành BSON date)."""
+    return datetime.now(timezone.utc)
+
+
+# ==================== TRUY VẤN THEO KHOẢNG THỜI GIAN ====================
+def logs_between(
+    collection: str,
+    username: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    projection: Optional[dict] = None,
+    limit: int = 0,
+) -> List[dict]:
+    """
+    Log của `username` trong [start, end), mới nhất trước.
+    Lọc theo username + khoảng timestamp nên dùng được index (username, timestamp).
+    """
+    if collection not in LOG_COLLECTIONS:
+        raise ValueError(f"Collection log không hợp lệ: {collection}")
+    query: Dict[str, Any] = {"username": username}
+    if start is not None or end is not None:
+        query["timestamp"] = {}
+        if start is not None:
+            query["timestamp"]["$gte"] = start
+        if end is not None:
+            query["timestamp"]["$lt"] = end
+    cursor = (
+        logs_db()[collection]
+        .find(query, projection if projection is not None else {"_id": 0, "raw": 0})
+        .sort("timestamp", DESCENDING)
+        .limit(limit)
+    )
+    return list(cursor)
+
+
+def logs_last_days(collection: str, username: str, days: int = 7, **kwargs) -> List[dict]:
+    """Ví dụ: logs_last_days("analysis_logs", "nam", 7) – log 7 ngày gần nhất của user."""
+    return logs_between(collection, username, start=utcnow() - timedelta(days=days), **kwargs)
+
+
+# ==================== ROLLUP THEO NGÀY ====================
+def _rollup_tz(name: str):
+    """Cùng cú pháp với backend/rollups.parse_tz: +0700, +07:00, +07 hoặc tên IANA."""
+    if not name:
+        return LOCAL_TZ
+    m = re.fullmatch(r"([+-])(\d{2}):?(\d{2})?", name)
+    if m:
+        offset = timedelta(hours=int(m.group(2)), minutes=int(m.group(3) or 0))
+        return timezone(-offset if m.group(1) == "-" else offset)
+    return ZoneInfo(name)
+
+
+ROLLUP_TZ = _rollup_tz(STATS_TIMEZONE)
+
+
+def _local_day(ts: datetime) -> datetime:
+    local = ts.astimezone(ROLLUP_TZ)
+    return datetime(local.year, local.month, local.day, tzinfo=ROLLUP_TZ).astimezone(timezone.utc)
+
+
+def _bump_rollup(entry: dict, source: str) -> None:
+    """Cộng dồn log vừa ghi vào bản ghi rollup của (user, ngày, nguồn) bằng một lệnh $inc (upsert)."""
+    counts = entry.get("counts") or {}
+    inc = {"logs": 1, "detections": sum(counts.values())}
+    for label, n in counts.items():
+        inc[f"counts.{label}"] = n
+    logs_db()[ROLLUP_COLLECTION].update_one(
+        {"username": entry["username"], "day": _local_day(entry["timestamp"]), "source": source},
+        {"$inc": inc, "$set": {"updated_at": utcnow()}},
+        upsert=True,
+    )
+
+
+# ==================== PHÂN TÍCH ẢNH ====================
+def insert_analysis_log(entry: AnalysisLog) -> None:
+    logs_db()["analysis_logs"].insert_one(entry)
+    _bump_rollup(entry, "image")
+
+
+# ==================== VIDEO / WEBCAM ====================
+def insert_video_log(entry: VideoLog) -> None:
+    logs_db()["video_logs"].insert_one(entry)
+    _bump_rollup(entry, entry.get("source") or "video")
+
+
+# ==================== CHAT ====================
+def recent_chats(username: str, limit: int = 10) -> List[ChatLog]:
+    """`limit` lượt chat gần nhất, theo thứ tự cũ → mới."""
+    cursor = (
+        logs_db()["chat_logs"]
+        .find({"username": username}, {"_id": 0, "user_message": 1, "assistant_reply": 1, "timestamp": 1})
+        .sort("timestamp", DESCENDING)
+        .limit(limit)
+    )
+    chats = list(cursor)
+    chats.reverse()
+    return chats
+
+
+def insert_chat(entry: ChatLog) -> None:
+    logs_db()["chat_logs"].insert_one(entry)
+    _bump_rollup(entry, "chat")
+
+
+def clear_chats(username: str) -> int:
+    deleted = logs_db()["chat_logs"].delete_many({"username": username}).deleted_count
+    # Xoá toàn bộ chat của user → rollup chat của user cũng về 0
+    logs_db()[ROLLUP_COLLECTION].delete_many({"username": username, "source": "chat"})
+    return deleted
+
+
+# ==================== SO SÁNH MÔ HÌNH ====================
+def insert_compare_log(entry: CompareLog) -> None:
+    logs_db()["compare_logs"].insert_one(entry)
+    _bump_rollup(entry, "compare")
+
+
+# ==================== TÀI KHOẢN ====================
+def activity_counts(username: str) -> Dict[str, int]:
+    """Số lần phân tích ảnh / báo cáo / lượt chat, cộng từ rollup theo ngày thay vì đếm log gốc."""
+    rows = logs_db()[ROLLUP_COLLECTION].aggregate([
+        {"$match": {"username": username}},
+        {"$group": {"_id": "$source", "logs": {"$sum": "$logs"}}},
+    ])
+    by_source = {row["_id"]: row["logs"] for row in rows}
+    return {
+        "analysis": by_source.get("image", 0),
+        "compare": by_source.get("compare", 0),
+        "chat": by_source.get("chat", 0),
+    }
+
+
+def get_user(username: str) -> Optional[dict]:
+    """Hồ sơ người dùng (không có mật khẩu). Ghi/sửa user vẫn đi qua API /auth của backend."""
+    return get_client()[USERS_DB]["users"].find_one({"username": username}, {"_id": 0, "password": 0})
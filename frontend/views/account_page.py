@@ -1,9 +1,8 @@
 import streamlit as st
 import requests
-import os
 import time
-from pymongo import MongoClient
-from dotenv import load_dotenv
+
+from utils import db
 
 
 def show():
@@ -22,22 +21,15 @@ def show():
 
     username = st.session_state["user"]
 
-    # --- Kết nối MongoDB ---
-    load_dotenv()
-    MONGO_URI = os.getenv("MONGO_URI")
-    try:
-        client = MongoClient(MONGO_URI)
-        db = client["mit_detection"]
-    except Exception as e:
-        st.error(f"⚠️ Lỗi kết nối MongoDB: {e}")
-        st.stop()
-
     # --- Lấy thông tin người dùng ---
     try:
-        res = requests.get(f"http://127.0.0.1:8000/auth/info?username={username}")
-        user = res.json() if res.status_code == 200 else None
+        user = db.get_user(username)
     except Exception:
         user = None
+    if user:
+        for field in ("created_at", "last_login"):
+            if user.get(field):
+                user[field] = user[field].strftime("%d/%m/%Y %H:%M")
 
     if not user:
         st.error("⚠️ Không thể tải thông tin người dùng.")
@@ -82,9 +74,8 @@ def show():
 
     # --- Thống kê hoạt động ---
     try:
-        detections_count = db["analysis_logs"].count_documents({"username": username})
-        reports_count = db["compare_logs"].count_documents({"username": username})
-        chats_count = db["chat_logs"].count_documents({"username": username})
+        counts = db.activity_counts(username)
+        detections_count, reports_count, chats_count = counts["analysis"], counts["compare"], counts["chat"]
     except Exception as e:
         st.warning(f"Lỗi tải thống kê: {e}")
         detections_count = reports_count = chats_count = 0
@@ -6,16 +6,17 @@ import base64
 import requests
 import pandas as pd
 from PIL import Image
-from datetime import datetime
 from dotenv import load_dotenv
-from pymongo import MongoClient
 import google.generativeai as genai
 
+from utils import db
+
 # === KHỞI TẠO & CẤU HÌNH ===
 load_dotenv()
 API_PREDICT = os.getenv("API_PREDICT", "http://127.0.0.1:8000/predict")
-MONGO_URI = os.getenv("MONGO_URI")
 GEMINI_KEY = os.getenv("GEMINI_API_KEY")
+RESULT_MAX_DIM = int(os.getenv("RESULT_MAX_DIM", "1280"))
+API_TIMEOUT = 30  # giây; server được báo deadline ngắn hơn để từ chối sớm thay vì xử lý rồi bị bỏ
 
 if GEMINI_KEY:
     try:
@@ -33,11 +34,6 @@ def show():
 
     st.header("📸 Phân tích ảnh")
 
-    # --- Kết nối MongoDB ---
-    client = MongoClient(MONGO_URI)
-    db = client["mit_detection"]
-    logs_col = db["analysis_logs"]
-
     # === Upload ảnh ===
     with st.container():
         st.markdown("### 🖼️ Chọn ảnh trái mít cần phân tích")
@@ -75,9 +71,18 @@ def show():
                     time.sleep(0.1)
                     progress.progress(percent)
 
-                resp = requests.post(API_PREDICT, files=files, params={"conf": confidence}, timeout=30)
+                # Ảnh kết quả hiển thị ở nửa trang: xin ảnh đã thu nhỏ thay vì nguyên độ phân giải tải lên
+                params = {
+                    "conf": confidence, "max_dim": RESULT_MAX_DIM, "quality": 80,
+                    "deadline_ms": (API_TIMEOUT - 5) * 1000,
+                }
+                resp = requests.post(API_PREDICT, files=files, params=params, timeout=API_TIMEOUT)
+                if resp.status_code == 503:
+                    retry = resp.headers.get("Retry-After", "vài")
+                    raise RuntimeError(f"Máy chủ đang bận, vui lòng thử lại sau {retry} giây.")
                 resp.raise_for_status()
                 data = resp.json()
+                timing = resp.headers.get("Server-Timing", "")
 
                 for percent in range(80, 101, 10):
                     time.sleep(0.1)
@@ -86,6 +91,7 @@ def show():
             except Exception as e:
                 st.error(f"Lỗi gọi API: {e}")
                 data = None
+                timing = ""
 
             progress.empty()
             status_placeholder.empty()
@@ -111,7 +117,7 @@ def show():
                     p.pop("_id", None)
 
                 log_entry = {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": db.utcnow(),
                     "username": username,
                     "counts": counts,
                     "total": sum(counts.values()),
@@ -121,12 +127,16 @@ def show():
                 }
 
                 try:
-                    logs_col.insert_one(log_entry)
+                    db.insert_analysis_log(log_entry)
                     st.toast("Đã lưu kết quả vào lịch sử.", icon="✅", duration="short")
                 except Exception as e:
                     st.warning(f"⚠️ Không thể lưu log vào MongoDB: {e}")
 
                 out_image.image(annotated, use_container_width=True)
+                if timing:
+                    # Server-Timing: "decode;dur=12.3, inference;dur=45.6, ..."
+                    stages = [part.strip().replace(";dur=", ": ") + " ms" for part in timing.split(",")]
+                    st.caption("⏱️ " + " · ".join(stages))
 
                 detections = data.get("detections", [])
                 if not detections:
@@ -2,9 +2,10 @@ import streamlit as st
 import os
 from datetime import datetime
 from dotenv import load_dotenv
-from pymongo import MongoClient
 import google.generativeai as genai
 
+from utils import db
+
 
 def show():
     # --- Kiểm tra đăng nhập ---
@@ -15,18 +16,8 @@ def show():
 
     username = st.session_state["user"]
 
-    # --- Kết nối MongoDB ---
-    load_dotenv()
-    MONGO_URI = os.getenv("MONGO_URI")
-    try:
-        client = MongoClient(MONGO_URI)
-        db = client["mit_detection"]
-        chat_logs = db["chat_logs"]
-    except Exception as e:
-        st.warning(f"⚠️ Không thể kết nối MongoDB: {e}")
-        st.stop()
-
     # --- Cấu hình Gemini ---
+    load_dotenv()
     GEMINI_KEY = os.getenv("GEMINI_API_KEY")
     if GEMINI_KEY:
         try:
@@ -48,8 +39,11 @@ def show():
         st.session_state.chat_history = []
         st.session_state.chat_user = username
 
-        chats = list(chat_logs.find({"username": username}).sort("timestamp", -1).limit(10))
-        chats.reverse()
+        try:
+            chats = db.recent_chats(username, limit=10)
+        except Exception as e:
+            st.warning(f"⚠️ Không thể tải lịch sử chat từ MongoDB: {e}")
+            chats = []
         for c in chats:
             st.session_state.chat_history.append({"role": "user", "content": c["user_message"]})
             st.session_state.chat_history.append({"role": "assistant", "content": c["assistant_reply"]})
@@ -116,7 +110,10 @@ def show():
     clear_btn = st.button("🗑️", key="floating_clear", help="Xóa hội thoại", use_container_width=False)
     if clear_btn:
         st.session_state.chat_history = []
-        chat_logs.delete_many({"username": username})
+        try:
+            db.clear_chats(username)
+        except Exception as e:
+            st.warning(f"⚠️ Không thể xóa lịch sử chat trong MongoDB: {e}")
         st.toast("Đã xóa toàn bộ hội thoại", icon="🗑️")
         st.rerun()
 
@@ -166,8 +163,8 @@ def show():
 
         # --- Lưu vào MongoDB ---
         try:
-            chat_logs.insert_one({
-                "timestamp": datetime.now().isoformat(),
+            db.insert_chat({
+                "timestamp": db.utcnow(),
                 "username": username,
                 "user_message": user_input,
                 "assistant_reply": answer,
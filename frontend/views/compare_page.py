@@ -5,8 +5,6 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-from pymongo import MongoClient
-from dotenv import load_dotenv
 from reportlab.lib import colors as rl_colors
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
@@ -15,6 +13,8 @@ from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.cidfonts import UnicodeCIDFont
 from reportlab.pdfbase.ttfonts import TTFont
 
+from utils import db
+
 
 def show():
     # --- Kiểm tra đăng nhập ---
@@ -25,18 +25,6 @@ def show():
 
     username = st.session_state["user"]
 
-    # --- Kết nối MongoDB ---
-    dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
-    load_dotenv(dotenv_path=dotenv_path)
-    MONGO_URI = os.getenv("MONGO_URI")
-    try:
-        client = MongoClient(MONGO_URI)
-        db = client["mit_detection"]
-        compare_logs = db["compare_logs"]
-    except Exception as e:
-        st.warning(f"⚠️ Không thể kết nối MongoDB: {e}")
-        st.stop()
-
     # ======================= GIAO DIỆN =========================
     st.markdown("## ⚖️ So sánh mô hình YOLOv8n và YOLOv8s")
     st.caption("Đánh giá chi tiết hiệu năng mô hình nhận dạng mít – hỗ trợ chọn mô hình phù hợp cho ứng dụng.")
@@ -219,8 +207,8 @@ def show():
         st.session_state["pdf_buffer"] = pdf_buffer
 
         try:
-            compare_logs.insert_one({
-                "timestamp": datetime.now().isoformat(),
+            db.insert_compare_log({
+                "timestamp": db.utcnow(),
                 "username": username,
                 "src_n": uploaded_n.name,
                 "src_s": uploaded_s.name,
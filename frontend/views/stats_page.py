@@ -1,19 +1,43 @@
 # stats_page.py
 import streamlit as st
 import pandas as pd
+import requests
 import matplotlib.pyplot as plt
 from matplotlib.dates import DateFormatter
-from pymongo import MongoClient
-from datetime import datetime
-from dotenv import load_dotenv
+from datetime import datetime, timedelta, timezone
 import os
 
+API_STATS = os.getenv("API_BASE_URL", "http://127.0.0.1:8000") + "/stats"
+RANGES = {"7 ngày": 7, "30 ngày": 30, "90 ngày": 90, "1 năm": 365, "5 năm": 5 * 365}
+BUCKETS = {"Theo giờ": "hour", "Theo ngày": "day", "Theo tuần": "week"}
+BUCKET_DAYS = {"hour": 1 / 24, "day": 1, "week": 7}
+# Phải trùng STATS_MAX_BUCKETS của backend: chỉ đưa ra các cách gom nhóm backend chấp nhận
+STATS_MAX_BUCKETS = int(os.getenv("STATS_MAX_BUCKETS", "1000"))
+DATE_FORMATS = {"hour": "%d/%m %Hh", "day": "%d/%m", "week": "%d/%m/%y"}
+
+
+def _local(iso):
+    return datetime.fromisoformat(iso).astimezone()
+
+
+def _load_stats(username, days, bucket):
+    """Tổng hợp được tính sẵn ở backend (/stats): vài KB thay vì toàn bộ log."""
+    end = datetime.now(timezone.utc)
+    params = {
+        "username": username,
+        "start": (end - timedelta(days=days)).isoformat(),
+        "end": end.isoformat(),
+        "bucket": bucket,
+    }
+    resp = requests.get(API_STATS, params=params, timeout=15)
+    if resp.status_code != 200:
+        is_json = resp.headers.get("content-type", "").startswith("application/json")
+        raise RuntimeError(resp.json().get("detail") if is_json else resp.text)
+    return resp.json()
 
-def show():
-    # --- Tải môi trường & kiểm tra đăng nhập ---
-    load_dotenv()
-    MONGO_URI = os.getenv("MONGO_URI")
 
+def show():
+    # --- Kiểm tra đăng nhập ---
     if "user" not in st.session_state or not st.session_state["user"]:
         st.warning("⚠️ Bạn cần đăng nhập để xem thống kê vườn.")
         st.info("Vui lòng chuyển sang tab **Đăng nhập** để tiếp tục.")
@@ -21,11 +45,6 @@ def show():
 
     username = st.session_state["user"]
 
-    # --- Kết nối MongoDB ---
-    client = MongoClient(MONGO_URI)
-    db = client["mit_detection"]
-    logs_col = db["analysis_logs"]   # ✅ Đọc từ collection mới
-
     st.markdown("## AgriVision – Thống kê & Theo dõi vườn mít")
     st.markdown("""
     Xin chào 👋  
@@ -33,12 +52,24 @@ def show():
     Hệ thống tổng hợp kết quả nhận dạng, phân tích tỷ lệ mít **chín – non – sâu bệnh**,  
     và đưa ra **gợi ý hành động thực tế** giúp bạn quản lý vườn hiệu quả hơn 🌱
     """)
+
+    c_range, c_bucket = st.columns(2)
+    days = RANGES[c_range.selectbox("Khoảng thời gian", list(RANGES), index=1)]
+    # Khoảng dài thì ẩn bucket nhỏ (vd 5 năm theo ngày = 1825 bucket > STATS_MAX_BUCKETS)
+    buckets = [name for name, b in BUCKETS.items() if days / BUCKET_DAYS[b] <= STATS_MAX_BUCKETS] or ["Theo tuần"]
+    default = "Theo ngày" if "Theo ngày" in buckets else buckets[-1]
+    bucket = BUCKETS[c_bucket.selectbox("Gom nhóm", buckets, index=buckets.index(default))]
+    try:
+        stats = _load_stats(username, days, bucket)
+    except Exception as e:
+        st.error(f"⚠️ Không tải được thống kê: {e}")
+        st.stop()
     st.divider()
 
     # ======================= TỔNG QUAN NHẬN DẠNG =========================
     st.subheader("Tổng quan nhận dạng mới nhất")
 
-    latest_log = logs_col.find_one({"username": username}, sort=[("timestamp", -1)])
+    latest_log = stats["latest"]
     counts, total = {}, 0
 
     if latest_log:
@@ -52,7 +83,7 @@ def show():
     col4.metric("⚠️ Mít sâu bệnh", counts.get("mit_saubenh", 0))
 
     if total > 0:
-        st.caption(f"Cập nhật lúc {datetime.now().strftime('%H:%M – %d/%m/%Y')}")
+        st.caption(f"Cập nhật lúc {_local(latest_log['timestamp']).strftime('%H:%M – %d/%m/%Y')}")
         df_counts = pd.DataFrame(list(counts.items()), columns=["Loại", "Số lượng"])
         fig, ax = plt.subplots()
         colors = ["#7FC97F", "#FDBF6F", "#E31A1C"]
@@ -69,16 +100,14 @@ def show():
     # ======================= HOẠT ĐỘNG GẦN ĐÂY =========================
     st.subheader("📅 Nhật ký hoạt động nhận dạng")
 
-    logs = list(logs_col.find({"username": username}).sort("timestamp", -1).limit(50))
-    if logs:
-        df_hist = pd.DataFrame(logs)
-        df_hist["timestamp"] = pd.to_datetime(df_hist["timestamp"])
-
-        records = []
-        for _, row in df_hist.iterrows():
-            for k, v in row.get("counts", {}).items():
-                records.append({"timestamp": row["timestamp"], "class": k, "count": v})
-        df_flat = pd.DataFrame(records)
+    trend = stats["trend"]
+    if trend:
+        summary = stats["summary"]
+        st.caption(f"{summary['analyses']} lần phân tích, {summary['detections']} trái được phát hiện trong khoảng đã chọn.")
+        df_flat = pd.DataFrame([
+            {"timestamp": _local(row["time"]), "class": k, "count": v}
+            for row in trend for k, v in row["counts"].items()
+        ])
 
         if not df_flat.empty:
             plt.style.use("seaborn-v0_8-whitegrid")
@@ -90,7 +119,7 @@ def show():
                 "mit_saubenh": "#2196F3"
             }
 
-            ax.xaxis.set_major_formatter(DateFormatter("%m-%d"))
+            ax.xaxis.set_major_formatter(DateFormatter(DATE_FORMATS[bucket], tz=df_flat["timestamp"].iloc[0].tzinfo))
             for cls_name, group in df_flat.groupby("class"):
                 ax.plot(
                     group["timestamp"], group["count"],
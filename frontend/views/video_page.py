@@ -1,17 +1,25 @@
 import streamlit as st
 import os
+import sys
 import time
 import cv2 
 import tempfile
-from datetime import datetime
 from dotenv import load_dotenv
-from pymongo import MongoClient
 from ultralytics import YOLO
 import google.generativeai as genai
 
+# Dùng chung bộ vẽ box với backend (backend/renderer.py chỉ cần cv2 + numpy)
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+from backend.renderer import draw_detections
+from utils import db
+
+# Cạnh dài tối đa của khung webcam hiển thị: vẽ + gửi ảnh nhỏ hơn cho trình duyệt
+WEBCAM_DISPLAY_MAX_DIM = 960
+
 # --- Tải biến môi trường ---
 load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI")
 GEMINI_KEY = os.getenv("GEMINI_API_KEY")
 
 if GEMINI_KEY:
@@ -21,6 +29,25 @@ if GEMINI_KEY:
         pass
 
 
+def _to_predictions(result):
+    """Box của một khung → (predictions dạng JSON, xyxy, class_ids, confs)."""
+    boxes = result.boxes
+    names = result.names
+    xyxy = boxes.xyxy.cpu().numpy().astype(float)
+    class_ids = boxes.cls.cpu().numpy().astype(int)
+    confs = boxes.conf.cpu().numpy().astype(float)
+    predictions = [
+        {
+            "class": names.get(c, "mít"),
+            "confidence": round(p, 3),
+            "bbox": {"x": round(x1, 3), "y": round(y1, 3),
+                     "width": round(x2 - x1, 3), "height": round(y2 - y1, 3)},
+        }
+        for (x1, y1, x2, y2), c, p in zip(xyxy.tolist(), class_ids.tolist(), confs.tolist())
+    ]
+    return predictions, xyxy, class_ids, confs
+
+
 def show():
     # --- Kiểm tra đăng nhập ---
     if "user" not in st.session_state or not st.session_state["user"]:
@@ -30,14 +57,6 @@ def show():
 
     username = st.session_state["user"]
 
-    # --- Kết nối MongoDB ---
-    try:
-        client = MongoClient(MONGO_URI)
-        db = client["mit_detection"]
-        logs_col = db["video_logs"]
-    except Exception as e:
-        st.warning(f"⚠️ Không thể kết nối MongoDB: {e}")
-
     st.markdown("## 🎥 Phân tích Video / Webcam")
     st.info(
         "🤖 **AgriVision** nhận dạng độ chín trái mít trực tiếp từ video hoặc webcam. "
@@ -107,28 +126,9 @@ def show():
                     predictions_json = {"predictions": []}
 
                     if results and len(results) > 0:
-                        boxes = results[0].boxes
-                        labels = results[0].names
-                        for box in boxes:
-                            cls_id = int(box.cls[0])
-                            label = labels.get(cls_id, "mít")
-                            conf = float(box.conf[0])
-                            xyxy = box.xyxy[0].cpu().numpy().astype(float)
-                            x, y, w, h = xyxy[0], xyxy[1], xyxy[2]-xyxy[0], xyxy[3]-xyxy[1]
-                            predictions_json["predictions"].append({
-                                "class": label,
-                                "confidence": round(conf, 3),
-                                "bbox": {"x": round(x, 3), "y": round(y, 3),
-                                         "width": round(w, 3), "height": round(h, 3)}
-                            })
-                            cv2.rectangle(frame, (int(xyxy[0]), int(xyxy[1])),
-                                          (int(xyxy[2]), int(xyxy[3])), (0,255,0), 2)
-                            label_text = f"{label} {conf:.0%}"
-                            (tw, th), _ = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2)
-                            cv2.rectangle(frame, (int(xyxy[0]), int(xyxy[1]-th-6)),
-                                          (int(xyxy[0]+tw+4), int(xyxy[1])), (0,255,0), -1)
-                            cv2.putText(frame, label_text, (int(xyxy[0]+2), int(xyxy[1]-4)),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,0,0), 2)
+                        preds, xyxy, class_ids, confs = _to_predictions(results[0])
+                        predictions_json["predictions"] = preds
+                        frame = draw_detections(frame, xyxy, class_ids, confs, results[0].names)
 
                     frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                     st.image(frame_rgb, caption="📈 Khung giữa video sau nhận dạng", use_container_width=True)
@@ -143,7 +143,7 @@ def show():
                             counts[p["class"]] = counts.get(p["class"], 0) + 1
 
                         log_entry = {
-                            "timestamp": datetime.now().isoformat(),
+                            "timestamp": db.utcnow(),
                             "username": username,
                             "video_name": uploaded.name,
                             "counts": counts,
@@ -152,7 +152,7 @@ def show():
                             "source": "video",
                             "raw": predictions_json
                         }
-                        logs_col.insert_one(log_entry)
+                        db.insert_video_log(log_entry)
                         st.toast("Đã lưu lịch sử phân tích video.", icon="✅")
                     except Exception as e:
                         st.warning(f"⚠️ Không thể lưu log vào MongoDB: {e}")
@@ -252,25 +252,11 @@ def show():
                 results = model.predict(frame, conf=conf_v, verbose=False)
                 predictions_json = {"predictions": []}
                 if results and len(results) > 0:
-                    boxes = results[0].boxes
-                    labels = results[0].names
-                    for box in boxes:
-                        cls_id = int(box.cls[0])
-                        label = labels.get(cls_id, "mít")
-                        conf = float(box.conf[0])
-                        xyxy = box.xyxy[0].cpu().numpy().astype(float)
-                        x, y, w, h = xyxy[0], xyxy[1], xyxy[2]-xyxy[0], xyxy[3]-xyxy[1]
-                        predictions_json["predictions"].append({
-                            "class": label,
-                            "confidence": round(conf, 3),
-                            "bbox": {"x": round(x, 3), "y": round(y, 3),
-                                     "width": round(w, 3), "height": round(h, 3)}
-                        })
-                        cv2.rectangle(frame, (int(xyxy[0]), int(xyxy[1])),
-                                      (int(xyxy[2]), int(xyxy[3])), (0,255,0), 2)
-                        label_text = f"{label} {conf:.0%}"
-                        cv2.putText(frame, label_text, (int(xyxy[0]), int(xyxy[1]-10)),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,0,0), 2)
+                    preds, xyxy, class_ids, confs = _to_predictions(results[0])
+                    predictions_json["predictions"] = preds
+                    frame = draw_detections(
+                        frame, xyxy, class_ids, confs, results[0].names, max_dim=WEBCAM_DISPLAY_MAX_DIM
+                    )
 
                 frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
                 frame_slot.image(frame_rgb, use_container_width=True)
@@ -287,13 +273,13 @@ def show():
                         cls = p["class"]
                         counts[cls] = counts.get(cls, 0) + 1
                 log_entry = {
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": db.utcnow(),
                     "username": username,
                     "counts": counts,
                     "total": sum(counts.values()),
                     "confidence": conf_v,
                     "source": "webcam"
                 }
-                logs_col.insert_one(log_entry)
+                db.insert_video_log(log_entry)
             except Exception as e:
                 st.warning(f"⚠️ Không thể lưu log webcam: {e}")
\ No newline at end of file
@@ -0,0 +1,174 @@
+import asyncio
+import time
+import unittest
+
+from backend.admission import AdmissionController, AdmissionRejected, ClientDisconnected
+
+
+async def _hold(controller, release, entered=None, deadline_s=5.0, is_disconnected=None):
+    """Giữ một chỗ xử lý tới khi `release` được set; `entered` được set khi đã vào."""
+    async with controller.admit(time.monotonic() + deadline_s, is_disconnected):
+        if entered is not None:
+            entered.set()
+        await release.wait()
+
+
+class AdmissionControllerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_admits_immediately_when_idle(self):
+        controller = AdmissionController(max_concurrency=2, max_queue=0, initial_service_ms=10)
+        async with controller.admit(time.monotonic() + 1):
+            self.assertEqual(controller.stats()["running"], 1)
+        stats = controller.stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["admitted"], 1)
+
+    async def test_rejects_when_queue_full(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=0, initial_service_ms=10)
+        release, entered = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, entered))
+        await entered.wait()
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            async with controller.admit(time.monotonic() + 5):
+                pass
+        self.assertEqual(ctx.exception.reason, "queue_full")
+        self.assertGreaterEqual(ctx.exception.retry_after, 1)
+        self.assertEqual(controller.stats()["rejected_queue_full"], 1)
+
+        release.set()
+        await holder
+        self.assertEqual(controller.stats()["running"], 0)
+
+    async def test_rejects_when_deadline_cannot_be_met(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, initial_service_ms=1000)
+        with self.assertRaises(AdmissionRejected) as ctx:
+            async with controller.admit(time.monotonic() + 0.2):
+                pass
+        self.assertEqual(ctx.exception.reason, "deadline")
+        stats = controller.stats()
+        self.assertEqual(stats["rejected_deadline"], 1)
+        self.assertEqual(stats["running"], 0)
+
+    async def test_expires_in_queue(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, initial_service_ms=10, poll_interval=0.02)
+        release, entered = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, entered))
+        await entered.wait()
+
+        with self.assertRaises(AdmissionRejected) as ctx:
+            async with controller.admit(time.monotonic() + 0.1):
+                pass
+        self.assertEqual(ctx.exception.reason, "expired")
+        stats = controller.stats()
+        self.assertEqual(stats["expired_in_queue"], 1)
+        self.assertEqual(stats["waiting"], 0)
+        self.assertEqual(stats["running"], 1)
+
+        release.set()
+        await holder
+        self.assertEqual(controller.stats()["running"], 0)
+
+    async def test_drops_disconnected_waiter(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, initial_service_ms=10, poll_interval=0.02)
+        release, entered = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, entered))
+        await entered.wait()
+
+        async def disconnected():
+            return True
+
+        with self.assertRaises(ClientDisconnected):
+            async with controller.admit(time.monotonic() + 5, disconnected):
+                pass
+        stats = controller.stats()
+        self.assertEqual(stats["disconnected"], 1)
+        self.assertEqual(stats["waiting"], 0)
+
+        release.set()
+        await holder
+        self.assertEqual(controller.stats()["running"], 0)
+
+    async def test_hands_slot_to_waiters_in_fifo_order(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, initial_service_ms=10, poll_interval=0.02)
+        order = []
+        release = {name: asyncio.Event() for name in "abc"}
+        entered = {name: asyncio.Event() for name in "abc"}
+
+        async def worker(name):
+            async with controller.admit(time.monotonic() + 5):
+                order.append(name)
+                self.assertEqual(controller.stats()["running"], 1)
+                entered[name].set()
+                await release[name].wait()
+
+        a = asyncio.create_task(worker("a"))
+        await entered["a"].wait()
+        b = asyncio.create_task(worker("b"))
+        await asyncio.sleep(0)
+        c = asyncio.create_task(worker("c"))
+        await asyncio.sleep(0)
+        self.assertEqual(controller.stats()["waiting"], 2)
+
+        release["a"].set()
+        await entered["b"].wait()
+        self.assertEqual(controller.stats()["waiting"], 1)
+        release["b"].set()
+        await entered["c"].wait()
+        release["c"].set()
+        await asyncio.gather(a, b, c)
+
+        self.assertEqual(order, ["a", "b", "c"])
+        stats = controller.stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["admitted"], 3)
+
+    async def test_weighted_request_waits_for_enough_slots(self):
+        controller = AdmissionController(max_concurrency=3, max_queue=4, initial_service_ms=10, poll_interval=0.02)
+        release, entered = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, entered))
+        await entered.wait()
+
+        batch_entered = asyncio.Event()
+
+        async def batch():
+            async with controller.admit(time.monotonic() + 5, weight=3):
+                self.assertEqual(controller.stats()["running"], 3)
+                batch_entered.set()
+
+        task = asyncio.create_task(batch())
+        await asyncio.sleep(0.05)
+        self.assertFalse(batch_entered.is_set())
+        self.assertEqual(controller.stats()["waiting"], 1)
+
+        release.set()
+        await asyncio.gather(holder, task)
+        self.assertTrue(batch_entered.is_set())
+        self.assertEqual(controller.stats()["running"], 0)
+
+    async def test_weight_is_capped_at_concurrency(self):
+        controller = AdmissionController(max_concurrency=2, max_queue=0, initial_service_ms=10)
+        async with controller.admit(time.monotonic() + 1, weight=64):
+            self.assertEqual(controller.stats()["running"], 2)
+        self.assertEqual(controller.stats()["running"], 0)
+
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        controller = AdmissionController(max_concurrency=1, max_queue=4, initial_service_ms=10, poll_interval=0.02)
+        release, entered = asyncio.Event(), asyncio.Event()
+        holder = asyncio.create_task(_hold(controller, release, entered))
+        await entered.wait()
+
+        waiter = asyncio.create_task(_hold(controller, asyncio.Event()))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+
+        release.set()
+        await holder
+        stats = controller.stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["waiting"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+
+from backend.batcher import MicroBatcher
+
+
+class RecordingModel:
+    """predict_fn giả: ghi lại từng batch và trả về (ảnh, conf) cho mỗi ảnh."""
+
+    def __init__(self, error=None):
+        self.batches = []
+        self.error = error
+
+    def __call__(self, images, confs):
+        self.batches.append(list(images))
+        if self.error is not None:
+            raise self.error
+        return list(zip(images, confs))
+
+
+class MicroBatcherTest(unittest.IsolatedAsyncioTestCase):
+    async def test_flushes_when_batch_is_full(self):
+        model = RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=2, max_wait_ms=10_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit("a", 0.5), batcher.submit("b", 0.6)), timeout=2,
+        )
+        self.assertEqual(results, [("a", 0.5), ("b", 0.6)])
+        self.assertEqual(model.batches, [["a", "b"]])
+
+    async def test_flushes_partial_batch_after_max_wait(self):
+        model = RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=20)
+        result = await asyncio.wait_for(batcher.submit("a", 0.5), timeout=2)
+        self.assertEqual(result, ("a", 0.5))
+        self.assertEqual(batcher.stats()["batch_size_histogram"], {"1": 1})
+
+    async def test_skips_cancelled_requests(self):
+        model = RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=50)
+        a = asyncio.create_task(batcher.submit("a", 0.5))
+        b = asyncio.create_task(batcher.submit("b", 0.5))
+        c = asyncio.create_task(batcher.submit("c", 0.5))
+        await asyncio.sleep(0)
+        b.cancel()
+
+        self.assertEqual(await asyncio.wait_for(asyncio.gather(a, c), timeout=2), [("a", 0.5), ("c", 0.5)])
+        with self.assertRaises(asyncio.CancelledError):
+            await b
+        self.assertEqual(model.batches, [["a", "c"]])
+        self.assertEqual(batcher.stats()["images"], 2)
+
+    async def test_batch_of_only_cancelled_requests_is_not_run(self):
+        model = RecordingModel()
+        batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=20)
+        a = asyncio.create_task(batcher.submit("a", 0.5))
+        await asyncio.sleep(0)
+        a.cancel()
+        await asyncio.sleep(0.1)
+        self.assertEqual(model.batches, [])
+        self.assertEqual(batcher.stats()["batches"], 0)
+
+    async def test_error_is_delivered_to_every_request(self):
+        model = RecordingModel(error=RuntimeError("boom"))
+        batcher = MicroBatcher(model, max_batch_size=2, max_wait_ms=10_000)
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.submit("a", 0.5), batcher.submit("b", 0.5), return_exceptions=True), timeout=2,
+        )
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(batcher.stats()["batches_in_flight"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import tempfile
+import time
+import unittest
+
+from backend.cache import ResultCache
+
+
+class ResultCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.disk_dir = self._tmp.name
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_evicts_least_recently_used(self):
+        cache = ResultCache(max_entries=2, ttl=60)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # a mới được dùng → b cũ nhất
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_memory_entry_expires_after_ttl(self):
+        cache = ResultCache(max_entries=4, ttl=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 0)
+        self.assertEqual(stats["expirations"], 1)
+        self.assertEqual(stats["misses"], 1)
+
+    def test_disk_hit_is_promoted_to_memory(self):
+        cache = ResultCache(max_entries=1, ttl=60, disk_dir=self.disk_dir)
+        cache.put("aa", {"total": 1})
+        cache.put("bb", {"total": 2})  # aa bị đẩy khỏi bộ nhớ nhưng còn trên đĩa
+
+        self.assertEqual(cache.get("aa"), {"total": 1})
+        self.assertEqual(cache.get("aa"), {"total": 1})
+        stats = cache.stats()
+        self.assertEqual(stats["disk_hits"], 1)
+        self.assertEqual(stats["hits"], 1)
+
+    def test_disk_entry_expires_after_ttl(self):
+        cache = ResultCache(max_entries=0, ttl=60, disk_dir=self.disk_dir)
+        cache.put("aa", 1)
+        path = cache._disk_path("aa")
+        old = time.time() - 120
+        os.utime(path, (old, old))
+
+        self.assertIsNone(cache.get("aa"))
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(cache.stats()["expirations"], 1)
+
+    def test_corrupt_disk_entry_is_a_miss(self):
+        cache = ResultCache(max_entries=0, ttl=60, disk_dir=self.disk_dir)
+        cache.put("aa", 1)
+        with open(cache._disk_path("aa"), "wb") as f:
+            f.write(b"not a pickle")
+        self.assertIsNone(cache.get("aa"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_zero_entries_disables_cache(self):
+        cache = ResultCache(max_entries=0, ttl=60)
+        self.assertFalse(cache.enabled)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_zero_entries_with_disk_uses_disk_only(self):
+        cache = ResultCache(max_entries=0, ttl=60, disk_dir=self.disk_dir)
+        self.assertTrue(cache.enabled)
+        cache.put("aa", 1)
+        self.assertEqual(cache.get("aa"), 1)
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 0)
+        self.assertEqual(stats["disk_hits"], 1)
+
+    def test_key_depends_on_data_and_parameters(self):
+        key = ResultCache.make_key(b"img", "default", 0.5)
+        self.assertEqual(key, ResultCache.make_key(b"img", "default", 0.5))
+        self.assertNotEqual(key, ResultCache.make_key(b"img", "default", 0.25))
+        self.assertNotEqual(key, ResultCache.make_key(b"img2", "default", 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
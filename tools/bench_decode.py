@@ -0,0 +1,77 @@
+"""
+So sánh đường giải mã cũ (PIL → RGB → numpy BGR như ultralytics làm) với
+`backend.utils.decode_image` trên các ảnh trong example/.
+
+Ảnh mẫu khá nhỏ, nên mỗi ảnh còn được phóng to thành bản ~12 MP (như ảnh điện thoại)
+để thấy tác dụng của giải mã JPEG ở độ phân giải giảm.
+
+Chạy từ thư mục gốc:
+    python -m tools.bench_decode --repeat 20
+"""
+import argparse
+import glob
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from backend.config import ROOT_DIR, DECODE_TARGET_SIZE
+from backend.utils import decode_image
+
+
+def legacy_decode(data):
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    return np.ascontiguousarray(np.asarray(img)[:, :, ::-1])
+
+
+def upscale(data, long_side):
+    img = Image.open(io.BytesIO(data)).convert("RGB")
+    ratio = long_side / max(img.size)
+    img = img.resize((round(img.width * ratio), round(img.height * ratio)), Image.BICUBIC)
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def timeit(fn, data, repeat):
+    fn(data)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn(data)
+    return (time.perf_counter() - start) / repeat * 1000, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "example"))
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--upscale", type=int, default=4032, help="cạnh dài của bản phóng to (0 = bỏ qua)")
+    parser.add_argument("--target", type=int, default=DECODE_TARGET_SIZE)
+    args = parser.parse_args()
+
+    samples = []
+    for path in sorted(glob.glob(os.path.join(args.images, "*.jpg"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        name = os.path.basename(path)
+        samples.append((name, data))
+        if args.upscale:
+            samples.append((f"{name} @{args.upscale}px", upscale(data, args.upscale)))
+
+    print(f"{'ảnh':<36} {'gốc':>11} {'PIL (ms)':>9} {'mới (ms)':>9} {'ra':>11} {'nhanh hơn':>10}")
+    total_old = total_new = 0.0
+    for name, data in samples:
+        t_old, old = timeit(legacy_decode, data, args.repeat)
+        t_new, (new, _) = timeit(lambda d: decode_image(d, args.target), data, args.repeat)
+        total_old += t_old
+        total_new += t_new
+        src = f"{old.shape[1]}x{old.shape[0]}"
+        dst = f"{new.shape[1]}x{new.shape[0]}"
+        print(f"{name:<36} {src:>11} {t_old:>9.2f} {t_new:>9.2f} {dst:>11} {t_old / t_new:>9.2f}x")
+    print(f"\n{'Tổng':<36} {'':>11} {total_old:>9.2f} {total_new:>9.2f} {'':>11} {total_old / total_new:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+So sánh các cách mã hoá ảnh annotate trả về: thư viện (cv2 / PIL / simplejpeg nếu có),
+kích thước (cạnh dài), chất lượng, progressive và WebP. In thời gian mã hoá và dung lượng.
+
+Ảnh mẫu trong example/ được phóng to thành bản ~12 MP (như ảnh điện thoại) để thấy
+chênh lệch khi trả ảnh đúng kích thước client hiển thị thay vì nguyên ảnh tải lên.
+
+Chạy từ thư mục gốc:
+    python -m tools.bench_encode --repeat 10 --sizes 0 1280 640
+"""
+import argparse
+import glob
+import io
+import os
+import time
+
+import numpy as np
+from PIL import Image
+
+from backend.config import ROOT_DIR, IMAGE_QUALITY
+from backend.utils import decode_image, encode_bgr, resize_max_dim
+from tools.bench_decode import upscale
+
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+
+def _pil(fmt, **kw):
+    def enc(bgr, quality):
+        buf = io.BytesIO()
+        Image.fromarray(np.ascontiguousarray(bgr[:, :, ::-1])).save(buf, format=fmt, quality=quality, **kw)
+        return buf.getvalue()
+    return enc
+
+
+def encoders():
+    out = {
+        "cv2 jpeg": lambda a, q: encode_bgr(a, "jpeg", q),
+        "cv2 jpeg progressive": lambda a, q: encode_bgr(a, "jpeg", q, progressive=True),
+        "cv2 webp": lambda a, q: encode_bgr(a, "webp", q),
+        "PIL jpeg": _pil("JPEG"),
+        "PIL jpeg progressive": _pil("JPEG", progressive=True, optimize=True),
+    }
+    if simplejpeg is not None:
+        out["simplejpeg"] = lambda a, q: simplejpeg.encode_jpeg(a, quality=q, colorspace="BGR")
+    return out
+
+
+def timeit(fn, repeat):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        out = fn()
+    return (time.perf_counter() - start) / repeat * 1000, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "example"))
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--upscale", type=int, default=4032, help="cạnh dài của bản phóng to (0 = dùng ảnh gốc)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1280, 640], help="max_dim cần thử (0 = giữ nguyên)")
+    parser.add_argument("--quality", type=int, default=IMAGE_QUALITY)
+    args = parser.parse_args()
+
+    frames = []
+    for path in sorted(glob.glob(os.path.join(args.images, "*.jpg"))):
+        with open(path, "rb") as f:
+            data = f.read()
+        if args.upscale:
+            data = upscale(data, args.upscale)
+        frames.append(decode_image(data)[0])
+    if not frames:
+        raise SystemExit(f"Không có ảnh .jpg trong {args.images}")
+
+    encs = encoders()
+    print(f"{len(frames)} ảnh, quality={args.quality}, lặp {args.repeat} lần"
+          + ("" if simplejpeg else " (chưa cài simplejpeg, bỏ qua)"))
+    print(f"{'bộ mã hoá':<24} {'max_dim':>8} {'resize (ms)':>12} {'encode (ms)':>12} {'KB/ảnh':>9}")
+    for size in args.sizes:
+        t_resize, resized = timeit(lambda: [resize_max_dim(f, size) for f in frames], args.repeat)
+        for name, enc in encs.items():
+            t_enc, out = timeit(lambda: [enc(f, args.quality) for f in resized], args.repeat)
+            kb = sum(len(b) for b in out) / len(out) / 1024
+            label = size or f"{resized[0].shape[1]}px"
+            print(f"{name:<24} {label!s:>8} {t_resize / len(frames):>12.2f} {t_enc / len(frames):>12.2f} {kb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
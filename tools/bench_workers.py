@@ -0,0 +1,85 @@
+"""
+Đo thông lượng (ảnh/giây) của WorkerPool khi tăng số worker từ 1 tới N.
+
+Chạy từ thư mục gốc:
+    python -m tools.bench_workers --max-workers 8 --seconds 20
+"""
+import argparse
+import glob
+import os
+import threading
+import time
+
+from backend.config import ROOT_DIR
+from backend.utils import decode_uploaded_file
+from backend.worker_pool import WorkerPool, _available_cores
+
+
+def load_images(folder):
+    paths = sorted(glob.glob(os.path.join(folder, "*.jpg")) + glob.glob(os.path.join(folder, "*.png")))
+    imgs = []
+    for p in paths:
+        with open(p, "rb") as f:
+            imgs.append(decode_uploaded_file(f.read()))
+    if not imgs:
+        raise SystemExit(f"Không tìm thấy ảnh trong {folder}")
+    return imgs
+
+
+def run_once(num_workers, imgs, seconds, batch, conf):
+    pool = WorkerPool(num_workers)
+    try:
+        # Làm nóng mỗi worker một lần
+        for _ in range(num_workers):
+            pool.predict(imgs[:batch], conf)
+
+        done = [0]
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + seconds
+
+        def client(k):
+            i = k
+            while time.perf_counter() < stop_at:
+                chunk = [imgs[(i + j) % len(imgs)] for j in range(batch)]
+                pool.predict(chunk, conf)
+                i += batch
+                with lock:
+                    done[0] += batch
+
+        # Hai client cho mỗi worker để worker không phải chờ việc
+        threads = [threading.Thread(target=client, args=(k,)) for k in range(num_workers * 2)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        return done[0] / elapsed
+    finally:
+        pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=os.path.join(ROOT_DIR, "example"))
+    parser.add_argument("--max-workers", type=int, default=len(_available_cores()))
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--batch", type=int, default=1, help="số ảnh mỗi lần gửi tới worker")
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    imgs = load_images(args.images)
+    print(f"{len(imgs)} ảnh mẫu, {len(_available_cores())} core khả dụng\n")
+    print(f"{'workers':>8} {'ảnh/giây':>10} {'tăng tốc':>9}")
+
+    counts = sorted({2 ** k for k in range(args.max_workers.bit_length()) if 2 ** k <= args.max_workers}
+                    | {args.max_workers})
+    base = None
+    for n in counts:
+        ips = run_once(n, imgs, args.seconds, args.batch, args.conf)
+        base = base or ips
+        print(f"{n:>8} {ips:>10.2f} {ips / base:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Báo cáo so sánh model FP32 và bản INT8 (runtime "onnx-int8") trên một thư mục ảnh:
+số trái theo lớp, mức khớp box (IoU), và độ trễ mỗi ảnh.
+
+Chạy từ thư mục gốc (tạo bản INT8 nếu chưa có):
+    python -m tools.quant_report --images example --baseline torch --out quant_report.json
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from backend.config import MODEL_IMGSZ, QUANT_CALIB_DIR
+from backend.model_loader import load_model
+from backend.quantization import list_images
+from backend.utils import decode_uploaded_file
+
+
+def box_iou(a, b):
+    """IoU giữa hai tập box xyxy: (N, 4) x (M, 4) → (N, M)."""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(rb - lt, 0, None).prod(2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None] - inter + 1e-9)
+
+
+def match(ref, cand, iou_thr):
+    """Ghép tham lam các box cùng lớp theo IoU giảm dần; trả về danh sách IoU của các cặp khớp."""
+    ious = []
+    for c in np.union1d(ref["cls"], cand["cls"]):
+        ra, ca = ref["xyxy"][ref["cls"] == c], cand["xyxy"][cand["cls"] == c]
+        if not len(ra) or not len(ca):
+            continue
+        m = box_iou(ra, ca)
+        while m.size and m.max() >= iou_thr:
+            i, j = np.unravel_index(m.argmax(), m.shape)
+            ious.append(float(m[i, j]))
+            m[i, :] = -1
+            m[:, j] = -1
+    return ious
+
+
+def run(model, img, conf, repeat):
+    model.predict(source=img, conf=conf, save=False, verbose=False)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        r = model.predict(source=img, conf=conf, save=False, verbose=False)[0]
+    latency = (time.perf_counter() - start) / repeat * 1000
+    return {
+        "xyxy": r.boxes.xyxy.cpu().numpy(),
+        "cls": r.boxes.cls.cpu().numpy().astype(int),
+    }, latency, r.names
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=QUANT_CALIB_DIR)
+    parser.add_argument("--baseline", default="torch", choices=["torch", "onnx"], help="runtime FP32 làm mốc")
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--iou", type=float, default=0.5, help="ngưỡng IoU để coi hai box là khớp")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", help="ghi báo cáo chi tiết ra file JSON")
+    args = parser.parse_args()
+
+    fp32 = load_model(args.baseline)
+    int8 = load_model("onnx-int8")
+
+    names = None
+    per_image = []
+    counts = {"fp32": {}, "int8": {}}
+    all_ious, n_ref, n_cand = [], 0, 0
+    lat = {"fp32": [], "int8": []}
+
+    for path in list_images(args.images):
+        with open(path, "rb") as f:
+            img = decode_uploaded_file(f.read())
+        ref, t_ref, names = run(fp32, img, args.conf, args.repeat)
+        cand, t_cand, _ = run(int8, img, args.conf, args.repeat)
+        ious = match(ref, cand, args.iou)
+
+        for key, det in (("fp32", ref), ("int8", cand)):
+            for c in det["cls"].tolist():
+                counts[key][names[c]] = counts[key].get(names[c], 0) + 1
+        all_ious += ious
+        n_ref += len(ref["cls"])
+        n_cand += len(cand["cls"])
+        lat["fp32"].append(t_ref)
+        lat["int8"].append(t_cand)
+        per_image.append({
+            "image": os.path.basename(path),
+            "fp32_boxes": len(ref["cls"]),
+            "int8_boxes": len(cand["cls"]),
+            "matched": len(ious),
+            "mean_iou": round(float(np.mean(ious)), 4) if ious else None,
+            "fp32_ms": round(t_ref, 2),
+            "int8_ms": round(t_cand, 2),
+        })
+
+    if not per_image:
+        raise SystemExit(f"Không tìm thấy ảnh trong {args.images}")
+
+    classes = sorted(set(counts["fp32"]) | set(counts["int8"]) | set((names or {}).values()))
+    summary = {
+        "images": len(per_image),
+        "baseline": args.baseline,
+        "counts": {c: {"fp32": counts["fp32"].get(c, 0), "int8": counts["int8"].get(c, 0)} for c in classes},
+        "recall_vs_fp32": round(len(all_ious) / n_ref, 4) if n_ref else None,
+        "precision_vs_fp32": round(len(all_ious) / n_cand, 4) if n_cand else None,
+        "mean_iou": round(float(np.mean(all_ious)), 4) if all_ious else None,
+        "fp32_ms": round(float(np.mean(lat["fp32"])), 2),
+        "int8_ms": round(float(np.mean(lat["int8"])), 2),
+        "speedup": round(float(np.mean(lat["fp32"]) / np.mean(lat["int8"])), 2),
+        "imgsz": MODEL_IMGSZ,
+    }
+
+    print(f"## FP32 ({args.baseline}) vs INT8 – {summary['images']} ảnh, conf={args.conf}, IoU>={args.iou}\n")
+    print("| Lớp | FP32 | INT8 | Chênh |")
+    print("|---|---:|---:|---:|")
+    for c, v in summary["counts"].items():
+        print(f"| {c} | {v['fp32']} | {v['int8']} | {v['int8'] - v['fp32']:+d} |")
+    print()
+    print(f"- Box INT8 khớp box FP32 (recall): {summary['recall_vs_fp32']}")
+    print(f"- Box INT8 có box FP32 tương ứng (precision): {summary['precision_vs_fp32']}")
+    print(f"- IoU trung bình của các cặp khớp: {summary['mean_iou']}")
+    print(f"- Độ trễ trung bình: FP32 {summary['fp32_ms']} ms, INT8 {summary['int8_ms']} ms "
+          f"(nhanh hơn {summary['speedup']}x)")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"summary": summary, "images": per_image}, f, ensure_ascii=False, indent=2)
+        print(f"\nĐã ghi báo cáo chi tiết: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Client thử cho WebSocket /predict/ws: phát lại một file video như thể là webcam
+(giữ đúng nhịp fps gốc), in độ trễ, FPS đạt được và số khung bị bỏ.
+
+Chạy từ thư mục gốc (backend đang chạy ở cổng 8000):
+    python -m tools.ws_replay video.mp4 --width 640 --quality 70 --show
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import cv2
+import numpy as np
+import websockets
+
+
+async def replay(args):
+    cap = cv2.VideoCapture(args.video)
+    if not cap.isOpened():
+        raise SystemExit(f"Không mở được video: {args.video}")
+    src_fps = args.fps or cap.get(cv2.CAP_PROP_FPS) or 30.0
+
+    results = []
+    sent = 0
+    done = asyncio.Event()
+
+    async with websockets.connect(args.url, max_size=None) as ws:
+        await ws.send(json.dumps({
+            "type": "config", "width": args.width, "quality": args.quality,
+            "conf": args.conf, "annotate": args.show,
+        }))
+
+        # Server gửi cấu hình mặc định khi kết nối, rồi cấu hình đã thương lượng theo yêu cầu trên
+        session, configs = None, 0
+        while configs < 2:
+            msg = json.loads(await ws.recv())
+            if msg.get("type") == "config":
+                session, configs = msg, configs + 1
+            elif msg.get("type") == "error":
+                raise SystemExit(f"Server từ chối cấu hình: {msg.get('detail')}")
+        print(f"Tham số phiên: {session}")
+
+        async def receiver():
+            pending = None
+            try:
+                async for msg in ws:
+                    if isinstance(msg, bytes):
+                        if args.show and pending is not None:
+                            frame = cv2.imdecode(np.frombuffer(msg, np.uint8), cv2.IMREAD_COLOR)
+                            cv2.imshow("AgriVision realtime", frame)
+                            cv2.waitKey(1)
+                        continue
+                    data = json.loads(msg)
+                    if data.get("type") == "result":
+                        pending = data
+                        results.append(data)
+                        if args.verbose:
+                            print(f"#{data['seq']:>5} {sum(data['counts'].values()):>3} trái "
+                                  f"latency={data['latency_ms']:>7.1f} ms fps={data['fps']} dropped={data['dropped']}")
+                    elif data.get("type") == "error":
+                        print("Lỗi:", data.get("detail"))
+            except websockets.ConnectionClosed:
+                pass
+            finally:
+                done.set()
+
+        recv_task = asyncio.create_task(receiver())
+
+        # Gửi khung theo đúng nhịp video gốc, không chờ kết quả (giống camera thật)
+        interval = 1.0 / src_fps
+        start = time.perf_counter()
+        encode = [cv2.IMWRITE_JPEG_QUALITY, session.get("quality", args.quality)]
+        while True:
+            ok, frame = cap.read()
+            if not ok or (args.max_frames and sent >= args.max_frames):
+                break
+            h, w = frame.shape[:2]
+            width = session.get("width", args.width)
+            if max(h, w) > width:
+                r = width / max(h, w)
+                frame = cv2.resize(frame, (round(w * r), round(h * r)), interpolation=cv2.INTER_AREA)
+            ok, buf = cv2.imencode(".jpg", frame, encode)
+            await ws.send(buf.tobytes())
+            sent += 1
+            delay = start + sent * interval - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        # Chờ kết quả của khung cuối rồi đóng
+        await asyncio.sleep(args.drain)
+        await ws.close()
+        await done.wait()
+        recv_task.cancel()
+    cap.release()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nĐã gửi {sent} khung trong {elapsed:.1f}s (nguồn {src_fps:.1f} fps)")
+    if not results:
+        print("Không nhận được kết quả nào.")
+        return
+    lat = [r["latency_ms"] for r in results]
+    last = results[-1]
+    print(f"Đã xử lý {len(results)} khung, bỏ {last['dropped']} khung cũ")
+    print(f"FPS đạt được: {len(results) / elapsed:.2f}")
+    print(f"Độ trễ (ms): trung vị {statistics.median(lat):.1f}, "
+          f"p95 {sorted(lat)[int(0.95 * (len(lat) - 1))]:.1f}, max {max(lat):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/predict/ws")
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--quality", type=int, default=70)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--fps", type=float, default=0, help="ghi đè fps phát lại (0 = fps của video)")
+    parser.add_argument("--max-frames", type=int, default=0)
+    parser.add_argument("--drain", type=float, default=1.0, help="số giây chờ kết quả sau khung cuối")
+    parser.add_argument("--show", action="store_true", help="hiển thị ảnh annotate nhận về")
+    parser.add_argument("--verbose", action="store_true")
+    asyncio.run(replay(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()